@@ -1,28 +1,228 @@
-from django.contrib import admin
-from .models import Movie, CinemaHall, Screening, Seat, Booking
+from datetime import date, datetime, time, timedelta
+
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db import models
+from django.utils import timezone
+
+from .analytics import rollup_slice, rollup_totals
+from .exports import bookings_for_export, export_response
+from .models import ArchivedBooking, ArchivedScreening, Movie, CinemaHall, Screening, Seat, Booking, SalesRollup
+from .pagination import EstimatedCountPaginator
+from .schedule import copy_screenings, import_schedule
+from .search import is_available as is_search_available, search_movies
+
+class ObjectIdFilter(admin.FieldListFilter):
+    # Поле ввода ID вместо выпадающего списка из всех объектов
+    template = 'admin/cinema_app/object_id_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.parameter_name = f'{field_path}__id__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.related_model = field.remote_field.model
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def has_output(self):
+        return True
+
+    def value(self):
+        values = self.used_parameters.get(self.parameter_name)
+        return values[-1] if values else ''
+
+    def choices(self, changelist):
+        value = self.value()
+        selected = None
+        if value.isdigit():
+            selected = self.related_model._default_manager.filter(pk=value).first()
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': value,
+            'selected': selected,
+            'hidden': [(key, val) for key, val in changelist.params.items() if key != self.parameter_name],
+            'reset_query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+class DateRangeFilter(admin.FieldListFilter):
+    # Диапазон дат "с ... по ..." включительно, без DATE() в SQL - индекс используется
+    template = 'admin/cinema_app/date_range_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.parameter_from = f'{field_path}__from'
+        self.parameter_to = f'{field_path}__to'
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def expected_parameters(self):
+        return [self.parameter_from, self.parameter_to]
+
+    def has_output(self):
+        return True
+
+    def _value(self, name):
+        values = self.used_parameters.get(name)
+        return values[-1] if values else ''
+
+    def _bound(self, name, shift):
+        value = self._value(name)
+        if not value:
+            return None
+        try:
+            day = date.fromisoformat(value) + timedelta(days=shift)
+        except ValueError as error:
+            raise IncorrectLookupParameters(error)
+        if isinstance(self.field, models.DateTimeField):
+            return timezone.make_aware(datetime.combine(day, time.min))
+        return day
+
+    def queryset(self, request, queryset):
+        start = self._bound(self.parameter_from, 0)
+        end = self._bound(self.parameter_to, 1)
+        if start:
+            queryset = queryset.filter(**{f'{self.field_path}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{self.field_path}__lt': end})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'parameter_from': self.parameter_from,
+            'parameter_to': self.parameter_to,
+            'value_from': self._value(self.parameter_from),
+            'value_to': self._value(self.parameter_to),
+            'hidden': [
+                (key, value) for key, value in changelist.params.items()
+                if key not in self.expected_parameters()
+            ],
+            'reset_query_string': changelist.get_query_string(remove=self.expected_parameters()),
+        }
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    list_per_page = 50
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
     list_display = ['title', 'duration']
     search_fields = ['title']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо LIKE '%...%' по всей таблице
+        if not search_term or not is_search_available():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=search_movies(search_term, limit=500).values('pk')), False
+
 @admin.register(CinemaHall)
 class CinemaHallAdmin(admin.ModelAdmin):
     list_display = ['name', 'rows', 'seats_per_row', 'total_seats']
+    search_fields = ['name']
 
 @admin.register(Screening)
-class ScreeningAdmin(admin.ModelAdmin):
-    list_display = ['movie', 'hall', 'start_time', 'end_time', 'price']
-    list_filter = ['start_time', 'hall']
-    date_hierarchy = 'start_time'
+class ScreeningAdmin(LargeTableAdmin):
+    list_display = ['movie', 'hall', 'start_time', 'end_time', 'price', 'seats_booked']
+    list_filter = [('start_time', DateRangeFilter), ('hall', ObjectIdFilter)]
+    ordering = ['-start_time']
+    search_fields = ['movie__title']
+    autocomplete_fields = ['movie', 'hall']
+    actions = ['copy_to_next_week']
+
+    def get_queryset(self, request):
+        # __str__ сеанса обращается к фильму - и в списке, и в автодополнении
+        return super().get_queryset(request).select_related('movie', 'hall')
+
+    @admin.action(description='Скопировать выбранные сеансы на неделю вперёд')
+    def copy_to_next_week(self, request, queryset):
+        result = import_schedule(copy_screenings(queryset, timedelta(days=7)))
+        if result.created:
+            self.message_user(request, f'Создано сеансов: {len(result.created)}', messages.SUCCESS)
+        for conflict in result.conflicts[:20]:
+            self.message_user(request, conflict.message(), messages.WARNING)
+        if len(result.conflicts) > 20:
+            self.message_user(request, f'И ещё пересечений: {len(result.conflicts) - 20}', messages.WARNING)
 
 @admin.register(Seat)
-class SeatAdmin(admin.ModelAdmin):
+class SeatAdmin(LargeTableAdmin):
     list_display = ['hall', 'row', 'number']
-    list_filter = ['hall']
+    list_filter = [('hall', ObjectIdFilter)]
+    list_select_related = ['hall']
+    autocomplete_fields = ['hall']
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
     list_display = ['user', 'screening', 'seat', 'booked_at']
-    list_filter = ['screening', 'booked_at']
-    search_fields = ['user__username']
\ No newline at end of file
+    list_filter = [('screening', ObjectIdFilter), ('screening__hall', ObjectIdFilter), ('booked_at', DateRangeFilter)]
+    list_select_related = ['user', 'screening__movie', 'seat']
+    search_fields = ['user__username']
+    autocomplete_fields = ['user', 'screening']
+    raw_id_fields = ['seat']
+    actions = ['export_csv', 'export_ndjson']
+
+    @admin.action(description='Выгрузить выбранные бронирования в CSV')
+    def export_csv(self, request, queryset):
+        return export_response(request, bookings_for_export(queryset), 'csv')
+
+    @admin.action(description='Выгрузить выбранные бронирования в NDJSON')
+    def export_ndjson(self, request, queryset):
+        return export_response(request, bookings_for_export(queryset), 'ndjson')
+
+class ArchiveAdmin(LargeTableAdmin):
+    # Архив только для чтения: записи переносит команда archive_screenings
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedScreening)
+class ArchivedScreeningAdmin(ArchiveAdmin):
+    list_display = ['id', 'movie', 'hall', 'start_time', 'price', 'seats_booked', 'capacity']
+    list_filter = [('start_time', DateRangeFilter), ('hall', ObjectIdFilter)]
+    list_select_related = ['movie', 'hall']
+    ordering = ['-start_time']
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ArchiveAdmin):
+    list_display = ['id', 'user', 'screening', 'row', 'number', 'booked_at']
+    list_filter = [('screening', ObjectIdFilter), ('booked_at', DateRangeFilter)]
+    list_select_related = ['user', 'screening__movie']
+    search_fields = ['user__username']
+    ordering = ['-booked_at', '-id']
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    change_list_template = 'admin/cinema_app/salesrollup/change_list.html'
+    list_display = ['date', 'hour', 'movie', 'hall', 'screenings', 'seats_sold', 'capacity', 'revenue']
+    list_filter = [('date', DateRangeFilter), ('hall', ObjectIdFilter)]
+    list_select_related = ['movie', 'hall']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            queryset = response.context_data['cl'].queryset
+        except (AttributeError, KeyError):
+            return response
+        # Сводки считаются только по витрине, с учётом фильтров списка
+        response.context_data.update({
+            'totals': rollup_totals(queryset),
+            'summaries': [
+                ('По фильмам', rollup_slice(['movie'], queryset), 'movie'),
+                ('По залам', rollup_slice(['hall'], queryset), 'hall'),
+                ('По времени начала', rollup_slice(['hour'], queryset), 'hour'),
+                ('По дням', rollup_slice(['date'], queryset), 'date'),
+            ],
+        })
+        return response
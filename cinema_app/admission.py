@@ -0,0 +1,272 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+from .holds import user_holds
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Новых покупателей в секунду на сеанс и запас на пустую очередь
+    'RATE': 2.0,
+    'BURST': 30,
+    # Одновременных запросов к бронированию одного сеанса
+    'CONCURRENCY': 8,
+    'PASS_SECONDS': 10 * 60,
+    'TICKET_SECONDS': 60 * 60,
+    'POLL_SECONDS': 3,
+}
+
+PASS_COOKIE = 'admission_{}'
+TICKET_COOKIE = 'queue_{}'
+COOKIE_SALT = 'cinema_app.admission'
+# Счётчик активных запросов живёт ограниченно: если процесс упал посреди
+# запроса, слот освободится сам
+SLOT_TTL = 60
+METRICS_WINDOW = 10 * 60
+# Сколько последних зарегистрированных сеансов просматривает metrics()
+METRICS_SCREENINGS = 1000
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'ADMISSION', {})}
+
+
+def _key(screening_id, name):
+    return f'admission:{screening_id}:{name}'
+
+
+def _incr(key, delta=1, timeout=None):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _decr(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass
+
+
+def _minute(offset=0):
+    return int(time.time() // 60) - offset
+
+
+def _register(screening_id):
+    # Список сеансов для метрик - нумерованные ячейки: каждый сеанс занимает
+    # свою через incr, общий список никто не перезаписывает целиком
+    if cache.add(_key(screening_id, 'listed'), 1, METRICS_WINDOW):
+        slot = _incr('admission:registry:next')
+        cache.set(f'admission:registry:{slot}', screening_id, METRICS_WINDOW)
+
+
+def _record(screening_id, event, count=1):
+    minute = _minute()
+    _incr(f'admission:stats:{event}:{minute}', count, 2 * 60)
+    _incr(_key(screening_id, f'stats:{event}:{minute}'), count, 2 * 60)
+    _incr(_key(screening_id, f'stats:{event}'), count, METRICS_WINDOW)
+    _register(screening_id)
+
+
+def _take_tokens(screening_id, wanted, options):
+    # Ведро токенов в кэше: под коротким замком пересчитываем запас по времени.
+    # Замок занят - значит, идёт наплыв, и лишний покупатель подождёт в очереди
+    lock = _key(screening_id, 'lock')
+    if not cache.add(lock, 1, 2):
+        return 0
+    try:
+        now = time.time()
+        tokens, updated = cache.get(_key(screening_id, 'bucket')) or (options['BURST'], now)
+        tokens = min(options['BURST'], tokens + (now - updated) * options['RATE'])
+        granted = min(wanted, int(tokens))
+        cache.set(_key(screening_id, 'bucket'), (tokens - granted, now), METRICS_WINDOW)
+        return granted
+    finally:
+        cache.delete(lock)
+
+
+def _queue_state(screening_id):
+    keys = [_key(screening_id, 'serving'), _key(screening_id, 'tail')]
+    found = cache.get_many(keys)
+    return found.get(keys[0], 0), found.get(keys[1], 0)
+
+
+def _advance(screening_id, options):
+    # Очередь - два счётчика: выданные билеты (tail) и последний пропущенный
+    # (serving). Токены пропускают ожидающих по порядку номеров
+    serving, tail = _queue_state(screening_id)
+    if tail > serving:
+        granted = _take_tokens(screening_id, tail - serving, options)
+        if granted:
+            serving = _incr(_key(screening_id, 'serving'), granted, options['TICKET_SECONDS'])
+            _record(screening_id, 'admitted', granted)
+    return serving, tail
+
+
+def enter(screening_id):
+    # None - покупатель пропущен, иначе номер билета в очереди
+    options = config()
+    serving, tail = _advance(screening_id, options)
+    if tail <= serving and _take_tokens(screening_id, 1, options):
+        _record(screening_id, 'admitted')
+        return None
+    _record(screening_id, 'queued')
+    return _incr(_key(screening_id, 'tail'), 1, options['TICKET_SECONDS'])
+
+
+def position(screening_id, ticket):
+    # 0 - очередь дошла; None - состояние очереди потеряно (сброс кэша)
+    serving, tail = _advance(screening_id, config())
+    if ticket > tail:
+        return None
+    return max(ticket - serving, 0)
+
+
+def acquire_slot(screening_id):
+    options = config()
+    if _incr(_key(screening_id, 'active'), 1, SLOT_TTL) > options['CONCURRENCY']:
+        _decr(_key(screening_id, 'active'))
+        _record(screening_id, 'rejected')
+        return False
+    return True
+
+
+def release_slot(screening_id):
+    _decr(_key(screening_id, 'active'))
+
+
+def has_pass(request, screening_id, user_id):
+    value = request.get_signed_cookie(
+        PASS_COOKIE.format(screening_id), default=None, salt=COOKIE_SALT, max_age=config()['PASS_SECONDS'],
+    )
+    return value == str(user_id)
+
+
+def grant_pass(response, screening_id, user_id):
+    response.set_signed_cookie(
+        PASS_COOKIE.format(screening_id), str(user_id), salt=COOKIE_SALT,
+        max_age=config()['PASS_SECONDS'], httponly=True, samesite='Lax',
+    )
+    response.delete_cookie(TICKET_COOKIE.format(screening_id))
+
+
+def read_ticket(request, screening_id):
+    # Билет подписан вместе с id пользователя: опрос очереди не читает сессию и БД
+    value = request.get_signed_cookie(
+        TICKET_COOKIE.format(screening_id), default=None, salt=COOKIE_SALT, max_age=config()['TICKET_SECONDS'],
+    )
+    try:
+        user_id, ticket = map(int, value.split(':'))
+    except (AttributeError, ValueError):
+        return None, None
+    return user_id, ticket
+
+
+def _give_ticket(response, screening_id, user_id, ticket):
+    response.set_signed_cookie(
+        TICKET_COOKIE.format(screening_id), f'{user_id}:{ticket}', salt=COOKIE_SALT,
+        max_age=config()['TICKET_SECONDS'], httponly=True, samesite='Lax',
+    )
+
+
+def wait_seconds(places):
+    return round(places / config()['RATE']) if places else 0
+
+
+def _queue_page(request, screening_id, places, status=200):
+    options = config()
+    response = render(request, 'cinema_app/queue.html', {
+        'screening_id': screening_id,
+        'position': places,
+        'wait_seconds': wait_seconds(places),
+        'poll_seconds': options['POLL_SECONDS'],
+    }, status=status)
+    response['Cache-Control'] = 'no-store'
+    response['Retry-After'] = str(options['POLL_SECONDS'])
+    return response
+
+
+def admission_control(view):
+    # Пропуск в бронирование сеанса: ведро токенов на вход и ограничение
+    # одновременных запросов; остальные ждут в очереди, а не в таймаутах БД
+    @wraps(view)
+    def wrapper(request, screening_id, *args, **kwargs):
+        if not config()['ENABLED']:
+            return view(request, screening_id, *args, **kwargs)
+
+        user_id = request.user.id
+        admitted_now = False
+        if not has_pass(request, screening_id, user_id):
+            if request.method == 'POST' and user_holds(screening_id, user_id):
+                # Места уже удержаны, а пропуск истёк, пока покупатель думал:
+                # подтверждение или отмену не отправляем в конец очереди
+                places = 0
+            else:
+                owner, ticket = read_ticket(request, screening_id)
+                places = position(screening_id, ticket) if owner == user_id else None
+                if places is None:
+                    ticket = enter(screening_id)
+                    places = 0 if ticket is None else position(screening_id, ticket)
+            if places:
+                response = _queue_page(request, screening_id, places)
+                _give_ticket(response, screening_id, user_id, ticket)
+                return response
+            admitted_now = True
+
+        if not acquire_slot(screening_id):
+            response = _queue_page(request, screening_id, 0, status=503)
+            if admitted_now:
+                grant_pass(response, screening_id, user_id)
+            return response
+        try:
+            response = view(request, screening_id, *args, **kwargs)
+        finally:
+            release_slot(screening_id)
+        if admitted_now:
+            grant_pass(response, screening_id, user_id)
+        return response
+    return wrapper
+
+
+def _registered_screenings():
+    last = cache.get('admission:registry:next') or 0
+    slots = [f'admission:registry:{slot}' for slot in range(max(1, last - METRICS_SCREENINGS + 1), last + 1)]
+    return sorted(set(cache.get_many(slots).values()))
+
+
+def metrics():
+    events = ('admitted', 'queued', 'rejected')
+    previous = _minute(1)
+    screenings = {}
+    for screening_id in _registered_screenings():
+        keys = {name: _key(screening_id, name) for name in (
+            'serving', 'tail', 'active',
+            *(f'stats:{event}' for event in events),
+            *(f'stats:{event}:{previous}' for event in events),
+        )}
+        found = cache.get_many(keys.values())
+        values = {name: found.get(key, 0) for name, key in keys.items()}
+        screenings[screening_id] = {
+            'queue_length': max(values['tail'] - values['serving'], 0),
+            'active_requests': values['active'],
+            **{event: values[f'stats:{event}'] for event in events},
+            'last_minute': {event: values[f'stats:{event}:{previous}'] for event in events},
+        }
+
+    # Темп считаем по последней полной минуте, текущая ещё набирается
+    minute_keys = {event: f'admission:stats:{event}:{previous}' for event in events}
+    found = cache.get_many(minute_keys.values())
+    last_minute = {event: found.get(key, 0) for event, key in minute_keys.items()}
+    return {
+        'config': config(),
+        'queue_length': sum(item['queue_length'] for item in screenings.values()),
+        'last_minute': last_minute,
+        'admitted_per_second': round(last_minute['admitted'] / 60, 2),
+        'screenings': screenings,
+    }
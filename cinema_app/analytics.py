@@ -0,0 +1,145 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedScreening, RollupDirtyDay, SalesRollup, Screening
+
+REBUILD_CHUNK_DAYS = 31
+
+# Срезы, по которым можно группировать витрину: имя -> поля values()
+DIMENSIONS = {
+    'movie': ('movie_id', 'movie__title'),
+    'hall': ('hall_id', 'hall__name'),
+    'date': ('date',),
+    'hour': ('hour',),
+}
+
+MEASURES = {
+    'screenings': Sum('screenings'),
+    'seats_sold': Sum('seats_sold'),
+    'capacity': Sum('capacity'),
+    'revenue': Sum('revenue'),
+}
+
+
+def mark_dirty(*moments):
+    dates = {
+        timezone.localdate(moment) if isinstance(moment, datetime) else moment
+        for moment in moments if moment
+    }
+    if not dates:
+        return
+
+    def upsert():
+        # marked_at обновляется и у уже отмеченных дней, чтобы пересборка их не потеряла
+        RollupDirtyDay.objects.bulk_create(
+            [RollupDirtyDay(date=day) for day in dates],
+            update_conflicts=True, unique_fields=['date'], update_fields=['marked_at'],
+        )
+
+    # После фиксации: строка дня не держится заблокированной всю транзакцию
+    # бронирования, а marked_at не оказывается раньше самих изменений
+    transaction.on_commit(upsert)
+
+
+def _day_bounds(first, last):
+    return (
+        timezone.make_aware(datetime.combine(first, time.min)),
+        timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+    )
+
+
+def _aggregate(queryset, capacity, dates):
+    start, end = _day_bounds(min(dates), max(dates))
+    revenue = ExpressionWrapper(F('seats_booked') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    return (
+        queryset.filter(start_time__gte=start, start_time__lt=end)
+        .annotate(date=TruncDate('start_time'), hour=ExtractHour('start_time'))
+        .filter(date__in=dates)
+        .values('date', 'movie_id', 'hall_id', 'hour')
+        .annotate(
+            screenings=Count('id'),
+            seats_sold=Sum('seats_booked'),
+            seats_capacity=Sum(capacity),
+            revenue=Sum(revenue),
+        )
+        .order_by()
+    )
+
+
+def _aggregate_screenings(dates):
+    # День может быть частично перенесён в архив: складываем обе таблицы
+    totals = {}
+    sources = (
+        (Screening.objects.all(), F('hall__rows') * F('hall__seats_per_row')),
+        (ArchivedScreening.objects.all(), F('capacity')),
+    )
+    for queryset, capacity in sources:
+        for row in _aggregate(queryset, capacity, dates):
+            row['capacity'] = row.pop('seats_capacity')
+            key = (row['date'], row['movie_id'], row['hall_id'], row['hour'])
+            if key in totals:
+                for measure in MEASURES:
+                    totals[key][measure] += row[measure]
+            else:
+                totals[key] = row
+    return totals.values()
+
+
+def rebuild_days(dates):
+    dates = sorted(dates)
+    created = 0
+    for offset in range(0, len(dates), REBUILD_CHUNK_DAYS):
+        chunk = dates[offset:offset + REBUILD_CHUNK_DAYS]
+        with transaction.atomic():
+            SalesRollup.objects.filter(date__in=chunk).delete()
+            created += len(SalesRollup.objects.bulk_create(
+                [SalesRollup(**row) for row in _aggregate_screenings(chunk)], batch_size=1000,
+            ))
+    return created
+
+
+def build_rollups(full=False):
+    dirty = RollupDirtyDay.objects.filter(marked_at__lte=timezone.now())
+    dates = set(dirty.values_list('date', flat=True))
+    if full:
+        dates.update(
+            Screening.objects.annotate(date=TruncDate('start_time'))
+            .values_list('date', flat=True).distinct().order_by()
+        )
+        dates.update(
+            ArchivedScreening.objects.annotate(date=TruncDate('start_time'))
+            .values_list('date', flat=True).distinct().order_by()
+        )
+        dates.update(SalesRollup.objects.values_list('date', flat=True).distinct().order_by())
+
+    created = rebuild_days(dates) if dates else 0
+    # Дни, отмеченные во время пересборки, останутся до следующего запуска
+    dirty.delete()
+    return len(dates), created
+
+
+def occupancy(row):
+    return round(row['seats_sold'] / row['capacity'], 4) if row['capacity'] else 0
+
+
+def rollup_slice(dimensions, queryset=None):
+    if queryset is None:
+        queryset = SalesRollup.objects.all()
+    fields = [field for dimension in dimensions for field in DIMENSIONS[dimension]]
+    rows = list(queryset.values(*fields).annotate(**MEASURES).order_by(*fields))
+    for row in rows:
+        row['occupancy'] = occupancy(row)
+    return rows
+
+
+def rollup_totals(queryset=None):
+    if queryset is None:
+        queryset = SalesRollup.objects.all()
+    totals = queryset.aggregate(**MEASURES)
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['occupancy'] = occupancy(totals)
+    return totals
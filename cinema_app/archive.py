@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .analytics import build_rollups
+from .models import ArchivedBooking, ArchivedScreening, Booking, Screening
+
+ARCHIVE_CHUNK_SIZE = 500
+
+
+def archive_after_days():
+    return getattr(settings, 'ARCHIVE_AFTER_DAYS', 90)
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=archive_after_days())
+
+
+def _archivable(cutoff):
+    # Сеанс должен и начаться до границы, и уже закончиться
+    return Screening.objects.filter(start_time__lt=cutoff, end_time__lt=timezone.now())
+
+
+def count_archivable(cutoff):
+    screenings = _archivable(cutoff)
+    return screenings.count(), Booking.objects.filter(screening__in=screenings).count()
+
+
+def _archive_chunk(screening_ids):
+    screenings = [
+        ArchivedScreening(**row)
+        for row in Screening.objects.filter(pk__in=screening_ids).values(
+            'id', 'movie_id', 'hall_id', 'start_time', 'end_time', 'price', 'seats_booked',
+            capacity=F('hall__rows') * F('hall__seats_per_row'),
+        )
+    ]
+    bookings = [
+        ArchivedBooking(id=pk, user_id=user_id, screening_id=screening_id, row=row, number=number, booked_at=booked_at)
+        for pk, user_id, screening_id, row, number, booked_at in Booking.objects.filter(
+            screening_id__in=screening_ids,
+        ).values_list('id', 'user_id', 'screening_id', 'seat__row', 'seat__number', 'booked_at')
+    ]
+
+    ArchivedScreening.objects.bulk_create(screenings, batch_size=1000)
+    ArchivedBooking.objects.bulk_create(bookings, batch_size=1000)
+    _delete_rows(Booking, 'screening_id', screening_ids)
+    _delete_rows(Screening, 'id', screening_ids)
+    return len(screenings), len(bookings)
+
+
+def _delete_rows(model, column, ids):
+    # Прямой DELETE: строки уже скопированы в архив. delete() при подключённых
+    # обработчиках загрузил бы каждую бронь в память, а сами обработчики вернули
+    # бы места в продажу и пометили дни витрины грязными
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {connection.ops.quote_name(column)} IN ({placeholders})', ids)
+
+
+def archive_screenings(cutoff, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    # Сначала витрина догоняет все изменения: после переноса дни пересобираются
+    # уже из архивных таблиц
+    build_rollups()
+
+    screenings = bookings = 0
+    while True:
+        screening_ids = list(_archivable(cutoff).order_by('start_time', 'id').values_list('id', flat=True)[:chunk_size])
+        if not screening_ids:
+            break
+        # Каждая пачка - отдельная короткая транзакция, чтобы не держать
+        # блокировку записи на весь перенос
+        with transaction.atomic():
+            moved_screenings, moved_bookings = _archive_chunk(screening_ids)
+        screenings += moved_screenings
+        bookings += moved_bookings
+        if progress:
+            progress(screenings, bookings)
+    return screenings, bookings
@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+
+BOOTSTRAP_VERSION = '5.1.3'
+BOOTSTRAP_CDN = f'https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist'
+
+# Сторонние файлы: путь в static/, источник и SRI-хэш оригинала
+VENDOR_ASSETS = {
+    'bootstrap_css': (
+        f'vendor/bootstrap-{BOOTSTRAP_VERSION}/bootstrap.min.css',
+        f'{BOOTSTRAP_CDN}/css/bootstrap.min.css',
+        'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3',
+    ),
+    'bootstrap_js': (
+        f'vendor/bootstrap-{BOOTSTRAP_VERSION}/bootstrap.bundle.min.js',
+        f'{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js',
+        'sha384-ka7Sk0Gln4gmtz2MlQnikT1wXgYsOg+OMhuP+IlRH9sENBO0LRn5q+8nbTov4+1p',
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def is_vendored(name):
+    return finders.find(VENDOR_ASSETS[name][0]) is not None
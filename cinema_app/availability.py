@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+
+from .holds import get_holds
+from .seatmap import aget_seatmap, get_seatmap, get_version
+
+STREAM_POLL_SECONDS = 1
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 5 * 60
+STREAM_RETRY_MS = 5000
+
+
+def make_etag(version, holds):
+    # Число живых холдов меняется и при их ленивом истечении,
+    # которое не увеличивает счётчик версий
+    return f'"{version}-{len(holds)}"'
+
+
+def current_etag(screening_id):
+    return make_etag(get_version(screening_id), get_holds(screening_id))
+
+
+def snapshot(screening):
+    version = get_version(screening.id)
+    seatmap = get_seatmap(screening)
+    holds = get_holds(screening.id)
+    return version, seatmap, holds
+
+
+async def asnapshot(screening):
+    version = get_version(screening.id)
+    seatmap = await aget_seatmap(screening)
+    return version, seatmap, get_holds(screening.id)
+
+
+def payload(screening, version, seatmap, holds):
+    return {
+        'screening': screening.id,
+        'version': version,
+        'rows': seatmap.rows,
+        'seats_per_row': seatmap.seats_per_row,
+        'booked': base64.b64encode(bytes(seatmap.bits)).decode('ascii'),
+        'held': sorted(key for key in holds if not seatmap.is_booked(*key)),
+    }
+
+
+def seat_states(seatmap, holds):
+    states = {}
+    for row, seats in seatmap.matrix(held=holds):
+        for number, state in seats:
+            states[f'{row}-{number}'] = state
+    return states
+
+
+def diff_states(previous, current):
+    return {key: state for key, state in current.items() if previous.get(key) != state}
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def snapshot_event(screening):
+    version, seatmap, holds = snapshot(screening)
+    return f'retry: {STREAM_RETRY_MS}\n' + sse_event('snapshot', payload(screening, version, seatmap, holds))
+
+
+async def stream_events(screening):
+    version, seatmap, holds = await asnapshot(screening)
+    yield f'retry: {STREAM_RETRY_MS}\n' + sse_event('snapshot', payload(screening, version, seatmap, holds))
+
+    etag = make_etag(version, holds)
+    states = seat_states(seatmap, holds)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_SECONDS
+    last_sent = loop.time()
+
+    while loop.time() < deadline:
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+        current = current_etag(screening.id)
+        if current != etag:
+            version, seatmap, holds = await asnapshot(screening)
+            etag = make_etag(version, holds)
+            new_states = seat_states(seatmap, holds)
+            changes = diff_states(states, new_states)
+            states = new_states
+            if changes:
+                yield sse_event('delta', {'version': version, 'changes': changes})
+                last_sent = loop.time()
+        if loop.time() - last_sent >= STREAM_HEARTBEAT_SECONDS:
+            yield ': ping\n\n'
+            last_sent = loop.time()
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import urls
+from .models import Booking, Screening
+
+# Потоковые и служебные страницы не меряем: их время определяется не запросами.
+# Подбор мест без параметра count отвечает 400
+SKIPPED_URLS = {'seat_availability_stream', 'page_cache_status', 'admission_metrics', 'best_seats'}
+
+
+@contextmanager
+def count_fetched_rows():
+    counter = {'rows': 0}
+
+    def wrap(name):
+        def method(self, *args):
+            with self.db.wrap_database_errors:
+                result = getattr(self.cursor, name)(*args)
+            if name == 'fetchone':
+                counter['rows'] += result is not None
+            else:
+                counter['rows'] += len(result)
+            return result
+        return method
+
+    names = ('fetchone', 'fetchmany', 'fetchall')
+    for name in names:
+        setattr(CursorWrapper, name, wrap(name))
+    try:
+        yield counter
+    finally:
+        for name in names:
+            delattr(CursorWrapper, name)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def sample_objects():
+    now = timezone.now()
+    screening = (
+        Screening.objects.filter(start_time__gt=now)
+        .order_by('-seats_booked', 'start_time').select_related('movie').first()
+    )
+    heavy_user = (
+        Booking.objects.values('user').annotate(total=Count('id')).order_by('-total').first()
+    )
+    booking = None
+    if heavy_user:
+        booking = (
+            Booking.objects.filter(user_id=heavy_user['user'], screening__start_time__gt=now)
+            .select_related('user').first()
+        )
+    return screening, booking
+
+
+def build_targets(screening, booking):
+    values = {
+        'screening_id': screening.id if screening else None,
+        'movie_id': screening.movie_id if screening else None,
+        'booking_id': booking.id if booking else None,
+    }
+    targets = []
+    for pattern in urls.urlpatterns:
+        if pattern.name in SKIPPED_URLS:
+            continue
+        kwargs = {name: values.get(name) for name in pattern.pattern.converters}
+        if None in kwargs.values():
+            continue
+        targets.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    return targets
+
+
+def measure(client, path, iterations, warmup=2):
+    for _ in range(warmup):
+        client.get(path)
+
+    timings, queries, rows, status = [], [], [], None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured, count_fetched_rows() as fetched:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        rows.append(fetched['rows'])
+        status = response.status_code
+
+    return {
+        'path': path,
+        'status': status,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': max(queries),
+        'rows': max(rows),
+    }
+
+
+def run(iterations):
+    screening, booking = sample_objects()
+    client = Client()
+    if booking:
+        client.force_login(booking.user)
+
+    results = {}
+    for name, path in build_targets(screening, booking):
+        results[name] = measure(client, path, iterations)
+    return {
+        'dataset': {
+            'screenings': Screening.objects.count(),
+            'bookings': Booking.objects.count(),
+        },
+        'iterations': iterations,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        # Количество запросов должно совпадать точно: рост - это почти всегда N+1
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: запросов {base['queries']} -> {result['queries']}")
+        for metric in ('p95_ms', 'rows'):
+            if base[metric] and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]}")
+    return regressions
+
+
+# Страницы только для чтения, которые отдаются асинхронными представлениями
+LOAD_TEST_URLS = ('home', 'movie_list', 'screening_list', 'seat_availability')
+
+
+def load_targets(screening):
+    targets = dict(build_targets(screening, None))
+    return [targets[name] for name in LOAD_TEST_URLS if name in targets]
+
+
+def _split(total, concurrency):
+    # Равные доли запросов на каждого из параллельных клиентов и сдвиг по списку страниц
+    share, extra = divmod(total, concurrency)
+    return [(share + (index < extra), index) for index in range(concurrency)]
+
+
+def _load_summary(results, elapsed):
+    timings = [timing for worker_timings, _ in results for timing in worker_timings]
+    return {
+        'requests': len(timings),
+        'errors': sum(errors for _, errors in results),
+        'rps': round(len(timings) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+    }
+
+
+def load_wsgi(paths, concurrency, total, user=None):
+    def worker(count, offset):
+        client = Client()
+        if user:
+            client.force_login(user)
+        timings, errors = [], 0
+        try:
+            for index in range(count):
+                started = time.perf_counter()
+                response = client.get(paths[(offset + index) % len(paths)])
+                timings.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code != 200
+        finally:
+            connections.close_all()
+        return timings, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda args: worker(*args), _split(total, concurrency)))
+    return _load_summary(results, time.perf_counter() - started)
+
+
+async def load_asgi(paths, concurrency, total, user=None):
+    async def worker(count, offset):
+        client = AsyncClient()
+        if user:
+            await client.aforce_login(user)
+        timings, errors = [], 0
+        for index in range(count):
+            started = time.perf_counter()
+            response = await client.get(paths[(offset + index) % len(paths)])
+            timings.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code != 200
+        return timings, errors
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(worker(count, offset) for count, offset in _split(total, concurrency)))
+    return _load_summary(results, time.perf_counter() - started)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(path, report):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
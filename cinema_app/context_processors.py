@@ -0,0 +1,5 @@
+from .pagecache import MOVIES, generations
+
+
+def page_cache(request):
+    return {'movies_generation': generations(MOVIES)[0]}
@@ -0,0 +1,111 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Booking
+
+CHUNK_SIZE = 2000
+
+# (ключ в NDJSON, заголовок CSV, поле запроса)
+EXPORT_COLUMNS = (
+    ('booking_id', 'Бронирование', 'id'),
+    ('booked_at', 'Дата бронирования', 'booked_at'),
+    ('username', 'Пользователь', 'user__username'),
+    ('email', 'Email', 'user__email'),
+    ('screening_id', 'Сеанс', 'screening_id'),
+    ('start_time', 'Начало сеанса', 'screening__start_time'),
+    ('movie', 'Фильм', 'screening__movie__title'),
+    ('hall', 'Зал', 'screening__hall__name'),
+    ('row', 'Ряд', 'seat__row'),
+    ('seat', 'Место', 'seat__number'),
+    ('price', 'Цена', 'screening__price'),
+)
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class Echo:
+    # csv.writer пишет в "файл", который просто возвращает строку
+    def write(self, value):
+        return value
+
+
+def bookings_for_export(queryset=None, date_from=None, date_to=None, hall=None):
+    if queryset is None:
+        queryset = Booking.objects.all()
+    if date_from:
+        queryset = queryset.filter(booked_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        queryset = queryset.filter(booked_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+    if hall:
+        queryset = queryset.filter(screening__hall=hall)
+    # values_list без моделей и кэша результатов: память не растёт с числом строк
+    return queryset.order_by('id').values_list(*(field for _, _, field in EXPORT_COLUMNS))
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat(timespec='seconds')
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow([header for _, header, _ in EXPORT_COLUMNS])
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow([_format_value(value) for value in row])
+
+
+def ndjson_lines(rows):
+    keys = [key for key, _, _ in EXPORT_COLUMNS]
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield json.dumps(dict(zip(keys, map(_format_value, row))), ensure_ascii=False) + '\n'
+
+
+def export_lines(rows, export_format):
+    return csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+
+
+def _batches(lines, size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def _stream(lines):
+    # Под ASGI синхронный итератор Django сначала вычитал бы целиком в память.
+    # Строки по-прежнему читает ORM в потоке, а в цикл событий отдаются пачками,
+    # чтобы не переключаться между потоками на каждую строку
+    batches = _batches(lines, CHUNK_SIZE)
+    fetch = sync_to_async(lambda: next(batches, None))
+    try:
+        while (batch := await fetch()) is not None:
+            yield batch
+    finally:
+        await sync_to_async(batches.close)()
+
+
+def export_response(request, rows, export_format):
+    content_type, extension = FORMATS[export_format]
+    lines = export_lines(rows, export_format)
+    if isinstance(request, ASGIRequest):
+        lines = _stream(lines)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    filename = f'bookings-{timezone.localtime():%Y%m%d-%H%M}.{extension}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,110 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .seatmap import bump_version
+
+# Отдельный кэш без вытеснения, см. CACHES в настройках
+cache = ConnectionProxy(caches, 'holds')
+
+# Индекс общий для всех покупателей сеанса, поэтому правится под
+# короткой блокировкой в кэше
+INDEX_LOCK_SECONDS = 1
+INDEX_LOCK_STEP = 0.005
+
+
+def hold_seconds():
+    return getattr(settings, 'SEAT_HOLD_SECONDS', 300)
+
+
+def _seat_key(screening_id, row, number):
+    return f'hold:{screening_id}:{row}-{number}'
+
+
+def _index_key(screening_id):
+    return f'hold:{screening_id}:index'
+
+
+def _live(index, now):
+    # Просроченные холды отбрасываются при чтении, отдельной чистки нет
+    return {key: value for key, value in index.items() if value[1] > now}
+
+
+def _lock_index(screening_id):
+    lock_key = _index_key(screening_id) + ':lock'
+    deadline = time.monotonic() + INDEX_LOCK_SECONDS
+    while not cache.add(lock_key, 1, INDEX_LOCK_SECONDS):
+        if time.monotonic() >= deadline:
+            # Владелец блокировки пропал - она истечёт сама, правим без неё
+            return None
+        time.sleep(INDEX_LOCK_STEP)
+    return lock_key
+
+
+def _update_index(screening_id, added=None, removed=()):
+    lock_key = _lock_index(screening_id)
+    try:
+        index = _live(cache.get(_index_key(screening_id)) or {}, time.time())
+        index.update(added or {})
+        for key in removed:
+            index.pop(key, None)
+        if index:
+            cache.set(_index_key(screening_id), index, hold_seconds())
+        else:
+            cache.delete(_index_key(screening_id))
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+
+
+def get_holds(screening_id):
+    return _live(cache.get(_index_key(screening_id)) or {}, time.time())
+
+
+def user_holds(screening_id, user_id):
+    # Индекс только подсказывает, какие места проверить: владельца
+    # подтверждает ключ самого места
+    candidates = {key: expires for key, (owner, expires) in get_holds(screening_id).items() if owner == user_id}
+    cache_keys = {_seat_key(screening_id, *key): key for key in candidates}
+    owners = cache.get_many(cache_keys)
+    return {
+        cache_keys[cache_key]: candidates[cache_keys[cache_key]]
+        for cache_key, owner in owners.items() if owner == user_id
+    }
+
+
+def held_by_others(screening_id, user_id, seat_keys):
+    cache_keys = {_seat_key(screening_id, *key): key for key in seat_keys}
+    owners = cache.get_many(cache_keys)
+    return {cache_keys[cache_key] for cache_key, owner in owners.items() if owner != user_id}
+
+
+def hold_seats(screening_id, user_id, seat_keys):
+    timeout = hold_seconds()
+    acquired, created = [], []
+    for key in seat_keys:
+        cache_key = _seat_key(screening_id, *key)
+        if cache.add(cache_key, user_id, timeout):
+            created.append(cache_key)
+        elif cache.get(cache_key) == user_id:
+            cache.touch(cache_key, timeout)
+        else:
+            cache.delete_many(created)
+            return {key}
+        acquired.append(key)
+
+    expires = time.time() + timeout
+    _update_index(screening_id, added={key: (user_id, expires) for key in acquired})
+    bump_version(screening_id)
+    return set()
+
+
+def release_seats(screening_id, user_id, seat_keys):
+    others = held_by_others(screening_id, user_id, seat_keys)
+    owned = [key for key in seat_keys if key not in others]
+    cache.delete_many([_seat_key(screening_id, *key) for key in owned])
+    _update_index(screening_id, removed=owned)
+    if owned:
+        bump_version(screening_id)
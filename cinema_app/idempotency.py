@@ -0,0 +1,100 @@
+import hashlib
+import re
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+
+FIELD_NAME = 'idempotency_key'
+HEADER_NAME = 'Idempotency-Key'
+PENDING = 'pending'
+# Отметка снимается в конце запроса; срок нужен только на случай, если
+# процесс упал посреди обработки
+PENDING_SECONDS = 5 * 60
+
+_VALID_KEY = re.compile(r'^[\w-]{8,100}$')
+
+
+def key_seconds():
+    return getattr(settings, 'IDEMPOTENCY_KEY_SECONDS', 15 * 60)
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def request_key(request):
+    key = request.headers.get(HEADER_NAME) or request.POST.get(FIELD_NAME)
+    return key if key and _VALID_KEY.match(key) else None
+
+
+def _cache_key(request, key):
+    # Ключ действует только для своего пользователя и адреса
+    raw = f'{request.user.id}|{request.path}|{key}'
+    return 'idempotency:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _queued_messages(request):
+    # Сообщения, добавленные за этот запрос, ещё не сохранены в хранилище
+    storage = getattr(request, '_messages', None)
+    return list(getattr(storage, '_queued_messages', []))
+
+
+def _record(response, new_messages):
+    return {
+        'location': response['Location'],
+        'messages': [(message.level, message.message, message.extra_tags) for message in new_messages],
+        'cookies': response.cookies,
+    }
+
+
+def _replay(request, outcome):
+    for level, text, extra_tags in outcome['messages']:
+        messages.add_message(request, level, text, extra_tags=extra_tags)
+    response = HttpResponseRedirect(outcome['location'])
+    response.cookies.update(outcome['cookies'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _in_progress():
+    response = HttpResponse('Запрос с этим ключом ещё выполняется.', status=409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def idempotent(view):
+    # Повтор POST с тем же ключом получает записанный редирект и сообщения
+    # первой попытки, не выполняя представление заново
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request_key(request) if request.method == 'POST' else None
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        while not cache.add(cache_key, PENDING, PENDING_SECONDS):
+            outcome = cache.get(cache_key)
+            # Первая попытка ещё выполняется: не держим второй воркер в ожидании
+            if outcome == PENDING:
+                return _in_progress()
+            if outcome is not None:
+                return _replay(request, outcome)
+            # Первая попытка завершилась ошибкой и сняла отметку: выполняем сами
+
+        before = len(_queued_messages(request))
+        response = None
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            # Запоминаем только завершённые действия (POST-redirect-GET); очередь,
+            # перегрузка и ошибки не выполнили действие, повтор должен пройти заново
+            if response is not None and 300 <= response.status_code < 400 and response.has_header('Location'):
+                cache.set(cache_key, _record(response, _queued_messages(request)[before:]), key_seconds())
+            else:
+                cache.delete(cache_key)
+        return response
+    return wrapper
@@ -0,0 +1,41 @@
+import time
+from datetime import datetime, time as day_start
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cinema_app.archive import ARCHIVE_CHUNK_SIZE, archive_screenings, count_archivable, default_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Переносит прошедшие сеансы и их бронирования в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Архивировать сеансы, начавшиеся до даты ГГГГ-ММ-ДД')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help='Сеансов в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, что будет перенесено')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+            cutoff = timezone.make_aware(datetime.combine(day, day_start.min))
+        else:
+            cutoff = default_cutoff()
+
+        if options['dry_run']:
+            screenings, bookings = count_archivable(cutoff)
+            self.stdout.write(f'К переносу до {timezone.localtime(cutoff):%d.%m.%Y %H:%M}: сеансов {screenings}, бронирований {bookings}')
+            return
+
+        started = time.perf_counter()
+
+        def progress(screenings, bookings):
+            self.stdout.write(f'  перенесено сеансов: {screenings}, бронирований: {bookings}')
+
+        screenings, bookings = archive_screenings(cutoff, options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено сеансов: {screenings}, бронирований: {bookings} за {time.perf_counter() - started:.1f} с'
+        ))
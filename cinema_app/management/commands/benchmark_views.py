@@ -0,0 +1,51 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import setup_test_environment
+
+from cinema_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку, число SQL-запросов и прочитанных строк для страниц приложения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline', help='JSON-файл с результатами для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост p95 и числа строк, доля')
+        parser.add_argument('--generate', action='store_true', help='Сначала пересоздать данные командой generate_dataset')
+        parser.add_argument('--halls', type=int, default=100)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            call_command(
+                'generate_dataset', clear=True, halls=options['halls'], days=options['days'],
+                users=options['users'], seed=options['seed'], stdout=self.stdout,
+            )
+
+        setup_test_environment()
+        # Сессии и прочие побочные записи замера не должны оставаться в базе
+        with transaction.atomic():
+            report = benchmarks.run(options['iterations'])
+            transaction.set_rollback(True)
+
+        dataset = report['dataset']
+        self.stdout.write(f"Сеансов: {dataset['screenings']}, бронирований: {dataset['bookings']}")
+        self.stdout.write(f"{'страница':<26}{'p50, мс':>10}{'p95, мс':>10}{'запросов':>10}{'строк':>10}")
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name:<26}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['queries']:>10}{result['rows']:>10}"
+            )
+
+        if options['output']:
+            benchmarks.save(options['output'], report)
+
+        if options['baseline']:
+            regressions = benchmarks.compare(report, benchmarks.load(options['baseline']), options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно базовой линии нет.'))
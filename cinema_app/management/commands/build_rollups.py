@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema_app.analytics import build_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает витрину продаж и заполняемости за дни, изменившиеся с прошлого запуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересобрать витрину за все дни')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days, rows = build_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано дней: {days}, строк витрины: {rows} за {time.perf_counter() - started:.1f} с'
+        ))
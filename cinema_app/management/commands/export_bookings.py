@@ -0,0 +1,46 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema_app.exports import FORMATS, bookings_for_export, export_lines
+from cinema_app.models import CinemaHall
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Некорректная дата: {value}, ожидается ГГГГ-ММ-ДД')
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает бронирования в CSV или NDJSON без загрузки всей выборки в память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--from', dest='date_from', type=parse_date, help='Первый день бронирования, ГГГГ-ММ-ДД')
+        parser.add_argument('--to', dest='date_to', type=parse_date, help='Последний день бронирования включительно')
+        parser.add_argument('--hall', type=int, help='ID зала')
+        parser.add_argument('--output', '-o', help='Файл для записи; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if options['date_from'] and options['date_to'] and options['date_from'] > options['date_to']:
+            raise CommandError('--from не может быть позже --to')
+        if options['hall'] and not CinemaHall.objects.filter(pk=options['hall']).exists():
+            raise CommandError(f"Зал {options['hall']} не найден")
+
+        rows = bookings_for_export(date_from=options['date_from'], date_to=options['date_to'], hall=options['hall'])
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        written = 0
+        try:
+            for line in export_lines(rows, options['format']):
+                output.write(line)
+                written += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        if options['format'] == 'csv':
+            written -= 1
+        self.stderr.write(self.style.SUCCESS(f'Выгружено бронирований: {written}'))
@@ -0,0 +1,185 @@
+import random
+import time as clock
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cinema_app.models import (
+    ArchivedBooking, ArchivedScreening, Booking, CinemaHall, Movie, RollupDirtyDay, SalesRollup, Screening, Seat,
+)
+from cinema_app.pagecache import MOVIES, invalidate
+from cinema_app.schedule import import_schedule, screening_end
+from cinema_app.search import rebuild_index
+
+FIRST_SLOT, LAST_SLOT = time(9), time(23)
+SLOT_ROUNDING = timedelta(minutes=15)
+
+
+def _round_up(moment):
+    extra = timedelta(minutes=moment.minute % 15, seconds=moment.second, microseconds=moment.microsecond)
+    return moment + (SLOT_ROUNDING - extra) % SLOT_ROUNDING
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетический набор данных заданного размера для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=50)
+        parser.add_argument('--halls', type=int, default=100)
+        parser.add_argument('--days', type=int, default=30, help='Сколько дней расписания создать начиная с сегодня')
+        parser.add_argument('--slots', type=int, default=5, help='Сеансов в день в каждом зале (сколько поместится с 9:00 до 23:00)')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--occupancy', type=float, default=0.3, help='Средняя доля проданных мест, 0..1')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Удалить существующие фильмы, залы и сеансы')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['occupancy'] <= 1:
+            raise CommandError('--occupancy должен быть в диапазоне от 0 до 1')
+        if not 1 <= options['slots'] <= 24:
+            raise CommandError('--slots должен быть в диапазоне от 1 до 24')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = clock.perf_counter()
+
+        if options['clear']:
+            # Прямой DELETE: обработчики сигналов на каждую из миллионов строк здесь не нужны.
+            # Порядок - от ссылающихся таблиц к тем, на которые ссылаются
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model in (
+                    ArchivedBooking, ArchivedScreening, SalesRollup, RollupDirtyDay,
+                    Booking, Screening, Seat, CinemaHall, Movie,
+                ):
+                    cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+        self.totals = {}
+        movies = self.create_movies(options['movies'])
+        halls = self.create_halls(options['halls'])
+        users = self.create_users(options['users'])
+        occupancy = options['occupancy'] if users else 0
+        # Зал за залом: в памяти только места и сеансы одного зала
+        self.conflicts = 0
+        for hall in halls:
+            seat_ids = self.create_seats(hall)
+            screenings = self.create_screenings(movies, hall, options['days'], options['slots'], occupancy)
+            self.create_bookings(screenings, seat_ids, users)
+        self.report()
+        if self.conflicts:
+            self.stdout.write(self.style.WARNING(f'  Пропущено сеансов из-за пересечений: {self.conflicts}'))
+        # bulk_create обходит сигналы: поисковый индекс фильмов обновляем сами,
+        # витрину продаж и кэш расписания уже обновил import_schedule
+        rebuild_index()
+
+        invalidate(MOVIES)
+        self.stdout.write(self.style.SUCCESS(f'Готово за {clock.perf_counter() - started:.1f} с'))
+
+    def insert(self, label, model, objects, keep=True):
+        started = clock.perf_counter()
+        created = []
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+            if keep:
+                created.extend(batch)
+        self.record(label, total, clock.perf_counter() - started)
+        return created
+
+    def record(self, label, total, elapsed):
+        rows, seconds = self.totals.get(label, (0, 0))
+        self.totals[label] = (rows + total, seconds + elapsed)
+
+    def report(self):
+        for label, (total, elapsed) in self.totals.items():
+            rate = total / elapsed if elapsed else 0
+            self.stdout.write(f'  {label}: {total} строк за {elapsed:.1f} с ({rate:,.0f} строк/с)')
+
+    def create_movies(self, count):
+        return self.insert('Фильмы', Movie, (
+            Movie(
+                title=f'Фильм {index:05d}',
+                description=f'Синтетический фильм номер {index} для нагрузочного тестирования.',
+                duration=self.rng.randint(80, 190),
+            )
+            for index in range(1, count + 1)
+        ))
+
+    def create_halls(self, count):
+        return self.insert('Залы', CinemaHall, (
+            CinemaHall(name=f'Зал {index:05d}', rows=self.rng.randint(5, 20), seats_per_row=self.rng.randint(8, 20))
+            for index in range(1, count + 1)
+        ))
+
+    def create_seats(self, hall):
+        self.insert('Места', Seat, (
+            Seat(hall_id=hall.id, row=row, number=number)
+            for row in range(1, hall.rows + 1)
+            for number in range(1, hall.seats_per_row + 1)
+        ), keep=False)
+        return list(Seat.objects.filter(hall_id=hall.id).values_list('id', flat=True))
+
+    def create_users(self, count):
+        password = make_password(None)
+        existing = set(User.objects.filter(username__startswith='loadtest_').values_list('username', flat=True))
+        usernames = (f'loadtest_{index:06d}' for index in range(1, count + 1))
+        self.insert('Пользователи', User, (
+            User(username=username, password=password) for username in usernames if username not in existing
+        ), keep=False)
+        return list(User.objects.filter(username__startswith='loadtest_').values_list('id', flat=True)[:count])
+
+    def create_screenings(self, movies, hall, days, slots, occupancy):
+        today = timezone.localdate()
+        capacity = hall.rows * hall.seats_per_row
+
+        def generate():
+            for day in range(days):
+                date = today + timedelta(days=day)
+                start_time = timezone.make_aware(datetime.combine(date, FIRST_SLOT))
+                last_start = timezone.make_aware(datetime.combine(date, LAST_SLOT))
+                # Сеансы идут подряд: следующий начинается после уборки за предыдущим
+                for _ in range(slots):
+                    if start_time > last_start:
+                        break
+                    movie = self.rng.choice(movies)
+                    end_time = screening_end(movie, start_time)
+                    sold = min(capacity, round(capacity * occupancy * self.rng.uniform(0.5, 1.5)))
+                    yield Screening(
+                        movie_id=movie.id,
+                        hall_id=hall.id,
+                        start_time=start_time,
+                        end_time=end_time,
+                        price=self.rng.choice((250, 350, 450, 550, 600)),
+                        seats_booked=sold,
+                    )
+                    start_time = _round_up(end_time)
+
+        # Через тот же построитель, что и импорт расписания: сеансы, задевающие
+        # уже существующие (повторный запуск без --clear), пропускаются
+        started = clock.perf_counter()
+        result = import_schedule(generate(), batch_size=self.batch_size)
+        self.record('Сеансы', len(result.created), clock.perf_counter() - started)
+        self.conflicts += len(result.conflicts)
+        return result.created
+
+    def create_bookings(self, screenings, seat_ids, users):
+        def generate():
+            for screening in screenings:
+                for seat_id in self.rng.sample(seat_ids, screening.seats_booked):
+                    yield Booking(user_id=self.rng.choice(users), screening_id=screening.id, seat_id=seat_id)
+
+        # Миллионы объектов бронирований дальше не нужны - не держим их в памяти
+        self.insert('Бронирования', Booking, generate(), keep=False)
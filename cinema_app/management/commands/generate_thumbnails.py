@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.models import Movie
+from cinema_app.thumbnails import generate_thumbs
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии постеров для фильмов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии для всех постеров')
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(poster='').exclude(poster__isnull=True)
+        if not options['force']:
+            movies = movies.filter(poster_thumbs=[])
+
+        done = 0
+        for movie_id, title in movies.values_list('id', 'title').iterator():
+            try:
+                widths = generate_thumbs(movie_id)
+            except OSError as error:
+                self.stderr.write(f'  ✗ {title}: {error}')
+                continue
+            done += 1
+            self.stdout.write(f'  ✓ {title}: {", ".join(map(str, widths))}')
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано постеров: {done}'))
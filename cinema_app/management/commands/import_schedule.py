@@ -0,0 +1,54 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cinema_app.models import Screening
+from cinema_app.schedule import copy_screenings, import_schedule, parse_csv
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Некорректная дата: {value}, ожидается ГГГГ-ММ-ДД')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пакет сеансов из CSV (movie, hall, start, price) или копирует расписание '
+        'на несколько дней вперёд; сеансы, пересекающиеся в одном зале, не создаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', nargs='?', help='CSV-файл с колонками movie, hall, start, price')
+        parser.add_argument('--copy-from', type=parse_date, help='Скопировать расписание, начиная с этого дня')
+        parser.add_argument('--copy-days', type=int, default=7, help='Сколько дней расписания копировать')
+        parser.add_argument('--shift-days', type=int, default=7, help='На сколько дней вперёд сдвинуть копию')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить пересечения, ничего не создавая')
+
+    def handle(self, *args, **options):
+        if bool(options['csv']) == bool(options['copy_from']):
+            raise CommandError('Укажите либо CSV-файл, либо --copy-from')
+
+        errors = []
+        if options['csv']:
+            with open(options['csv'], encoding='utf-8-sig', newline='') as file:
+                proposed, errors = parse_csv(file)
+        else:
+            start = timezone.make_aware(datetime.combine(options['copy_from'], time.min))
+            screenings = Screening.objects.filter(
+                start_time__gte=start, start_time__lt=start + timedelta(days=options['copy_days'])
+            )
+            proposed = copy_screenings(screenings, timedelta(days=options['shift_days']))
+
+        for error in errors:
+            self.stderr.write(f'  ✗ {error}')
+        result = import_schedule(proposed, dry_run=options['dry_run'])
+        for conflict in result.conflicts:
+            self.stderr.write(f'  ✗ {conflict.message()}')
+
+        verb = 'Можно создать' if options['dry_run'] else 'Создано'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} сеансов: {len(result.created)}, пересечений: {len(result.conflicts)}, ошибок в данных: {len(errors)}'
+        ))
@@ -0,0 +1,53 @@
+import asyncio
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from cinema_app import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест страниц только для чтения: сравнивает запросы в секунду и хвостовые '
+        'задержки обработчиков WSGI (потоки) и ASGI (корутины) при одинаковой параллельности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=1000, help='Всего запросов на каждый вариант развёртывания')
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+        parser.add_argument('--user', help='Имя пользователя, от которого идут запросы; по умолчанию анонимно')
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < options['concurrency']:
+            raise CommandError('--requests должно быть не меньше --concurrency, а --concurrency - не меньше 1')
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        screening, _ = benchmarks.sample_objects()
+        paths = benchmarks.load_targets(screening)
+        setup_test_environment()
+
+        args = (paths, options['concurrency'], options['requests'], user)
+        report = {'concurrency': options['concurrency'], 'paths': paths, 'results': {}}
+        if options['mode'] in ('both', 'wsgi'):
+            report['results']['wsgi'] = benchmarks.load_wsgi(*args)
+        if options['mode'] in ('both', 'asgi'):
+            report['results']['asgi'] = asyncio.run(benchmarks.load_asgi(*args))
+
+        self.stdout.write(f"Параллельность: {options['concurrency']}, страницы: {', '.join(paths)}")
+        self.stdout.write(f"{'режим':<8}{'запросов':>10}{'ошибок':>8}{'RPS':>10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+        for mode, result in report['results'].items():
+            self.stdout.write(
+                f"{mode:<8}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10}"
+                f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            )
+
+        if options['output']:
+            benchmarks.save(options['output'], report)
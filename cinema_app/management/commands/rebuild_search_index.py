@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema_app.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс FTS5 по названиям и описаниям фильмов'
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Полнотекстовый индекс FTS5 есть только в профиле SQLite')
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано фильмов: {indexed}'))
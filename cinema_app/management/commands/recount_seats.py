@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cinema_app.services import recount_seats_booked
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики забронированных мест у сеансов по таблице бронирований'
+
+    def handle(self, *args, **options):
+        fixed = recount_seats_booked()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено сеансов: {fixed}'))
@@ -0,0 +1,44 @@
+import base64
+import hashlib
+import re
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema_app.assets import VENDOR_ASSETS
+
+# Карты исходников не скачиваем: ссылка на отсутствующий файл ломает
+# ManifestStaticFilesStorage при collectstatic
+SOURCE_MAP = re.compile(rb'\n?(/\*# sourceMappingURL=\S+ \*/|//# sourceMappingURL=\S+)\s*$')
+
+
+def _sri(content):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode()
+
+
+class Command(BaseCommand):
+    help = 'Скачивает сторонние CSS/JS в static/vendor с проверкой SRI-хэша'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перезаписать уже скачанные файлы')
+
+    def handle(self, *args, **options):
+        root = Path(settings.STATICFILES_DIRS[0])
+        for name, (path, url, integrity) in VENDOR_ASSETS.items():
+            target = root / path
+            if target.exists() and not options['force']:
+                self.stdout.write(f'  {path}: уже есть')
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    content = response.read()
+            except OSError as error:
+                raise CommandError(f'{url}: не удалось скачать ({error})')
+            if _sri(content) != integrity:
+                raise CommandError(f'{url}: хэш не совпадает с {integrity}')
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(SOURCE_MAP.sub(b'\n', content))
+            self.stdout.write(f'  {path}: {len(content) // 1024} КБ')
+        self.stdout.write(self.style.SUCCESS('Готово. Закоммитьте static/vendor и выполните collectstatic'))
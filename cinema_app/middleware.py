@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+logger = logging.getLogger('cinema_app.profiling')
+
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar('cinema_profile', default=None)
+_template_render = Template.render
+
+
+def _profiled_template_render(self, *args, **kwargs):
+    stats = _current.get()
+    if stats is None:
+        return _template_render(self, *args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return _template_render(self, *args, **kwargs)
+    finally:
+        stats.template_ms += (time.perf_counter() - started) * 1000
+
+
+def _profiled_execute(execute, sql, params, many, context):
+    # Обёртка ставится на соединение один раз; запросы вне профилируемого
+    # запроса проходят насквозь. Контекст копируется и в потоки sync_to_async,
+    # поэтому запросы асинхронного ORM тоже попадают в статистику
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _install_wrapper(connection, **kwargs):
+    if _profiled_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profiled_execute)
+
+
+class RequestStats:
+    def __init__(self, slowest):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.view_started = None
+        self.slowest = slowest
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += elapsed
+            self.queries.append((elapsed, sql))
+            if len(self.queries) > self.slowest * 4:
+                self.queries = sorted(self.queries, reverse=True)[:self.slowest]
+
+    def slowest_queries(self):
+        return sorted(self.queries, reverse=True)[:self.slowest]
+
+
+class ViewHistograms:
+    def __init__(self, path, interval):
+        self.path = str(path).format(pid=os.getpid())
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.views = {}
+        self.last_dump = time.monotonic()
+
+    def record(self, view, total_ms, sql_ms):
+        with self.lock:
+            entry = self.views.setdefault(view, {
+                'count': 0, 'total_ms': 0.0, 'sql_ms': 0.0, 'buckets': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+            })
+            entry['count'] += 1
+            entry['total_ms'] += total_ms
+            entry['sql_ms'] += sql_ms
+            entry['buckets'][bisect_left(HISTOGRAM_BUCKETS_MS, total_ms)] += 1
+
+            if time.monotonic() - self.last_dump < self.interval:
+                return
+            self.last_dump = time.monotonic()
+            snapshot = json.dumps({
+                'pid': os.getpid(),
+                'dumped_at': time.time(),
+                'buckets_ms': list(HISTOGRAM_BUCKETS_MS) + ['inf'],
+                'views': self.views,
+            }, indent=2)
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(snapshot)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'PROFILING', {})
+        if not options.get('ENABLED'):
+            # Отключённый профайлер полностью исключается из цепочки middleware
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.slow_ms = options.get('SLOW_REQUEST_MS', 500)
+        self.slowest = options.get('SLOWEST_QUERIES', 5)
+        self.sample_rate = options.get('SAMPLE_RATE', 0.0)
+        self.histograms = None
+        if self.sample_rate:
+            self.histograms = ViewHistograms(
+                options.get('DUMP_PATH', settings.BASE_DIR / 'profiling-{pid}.json'),
+                options.get('DUMP_INTERVAL', 60),
+            )
+        Template.render = _profiled_template_render
+        connection_created.connect(_install_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats(self.slowest)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats(self.slowest)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _finish(self, request, response, stats, started):
+        finished = time.perf_counter()
+        total_ms = (finished - started) * 1000
+        view_ms = (finished - stats.view_started) * 1000 if stats.view_started else 0.0
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={stats.sql_ms:.1f};desc="{stats.sql_count} queries"',
+            f'tpl;dur={stats.template_ms:.1f}',
+            f'view;dur={view_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        if total_ms >= self.slow_ms:
+            logger.warning(
+                'Медленный запрос %s %s: %.0f мс, SQL %d шт. / %.0f мс, шаблоны %.0f мс\n%s',
+                request.method, request.get_full_path(), total_ms, stats.sql_count, stats.sql_ms, stats.template_ms,
+                '\n'.join(f'  {elapsed:.1f} мс: {sql[:300]}' for elapsed, sql in stats.slowest_queries()),
+            )
+
+        if self.histograms and random.random() < self.sample_rate:
+            match = request.resolver_match
+            self.histograms.record(match.view_name if match else 'unresolved', total_ms, stats.sql_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current.get().view_started = time.perf_counter()
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booked_at', '-id'], name='booking_user_booked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['start_time'], name='screening_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screening',
+            index=models.Index(fields=['movie', 'start_time'], name='screening_movie_start_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_seats_booked(apps, schema_editor):
+    Screening = apps.get_model('cinema_app', 'Screening')
+    Booking = apps.get_model('cinema_app', 'Booking')
+    booked = (
+        Booking.objects.filter(screening=OuterRef('pk'))
+        .values('screening').annotate(total=Count('id')).values('total')
+    )
+    Screening.objects.update(seats_booked=Coalesce(Subquery(booked), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screening',
+            name='seats_booked',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seats_booked, migrations.RunPython.noop),
+    ]
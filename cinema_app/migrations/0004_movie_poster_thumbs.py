@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0003_screening_seats_booked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='poster_thumbs',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Ширины готовых уменьшенных копий постера'),
+        ),
+    ]
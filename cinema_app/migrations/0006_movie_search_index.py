@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Movie = apps.get_model('cinema_app', 'Movie')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE cinema_app_movie_fts USING fts5("
+        "title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for movie in Movie.objects.only('pk', 'title', 'description').iterator():
+        schema_editor.execute(
+            'INSERT INTO cinema_app_movie_fts (rowid, title, description) VALUES (%s, %s, %s)',
+            [movie.pk, movie.title.replace('ё', 'е').replace('Ё', 'Е'), movie.description.replace('ё', 'е').replace('Ё', 'Е')],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS cinema_app_movie_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
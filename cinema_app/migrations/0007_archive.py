@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0006_movie_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedScreening',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('seats_booked', models.PositiveIntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('hall', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cinema_app.cinemahall')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cinema_app.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('row', models.PositiveSmallIntegerField()),
+                ('number', models.PositiveSmallIntegerField()),
+                ('booked_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('screening', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cinema_app.archivedscreening')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedscreening',
+            index=models.Index(fields=['start_time'], name='archived_screening_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', '-booked_at', '-id'], name='archived_booking_user_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema_app', '0007_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedbooking',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='archivedscreening',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
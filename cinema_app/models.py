@@ -1,7 +1,9 @@
 from django.db import models
 
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 class Movie(models.Model):
@@ -9,6 +11,7 @@ class Movie(models.Model):
     description = models.TextField()
     duration = models.IntegerField(help_text="Длительность в минутах")
     poster = models.ImageField(upload_to='posters/', blank=True, null=True)
+    poster_thumbs = models.JSONField(default=list, blank=True, editable=False, help_text="Ширины готовых уменьшенных копий постера")
     
     def __str__(self):
         return self.title
@@ -24,12 +27,48 @@ class CinemaHall(models.Model):
     def __str__(self):
         return f"{self.name} ({self.rows}x{self.seats_per_row})"
 
+class ScreeningQuerySet(models.QuerySet):
+    def with_seats_left(self):
+        return self.annotate(seats_left=F('hall__rows') * F('hall__seats_per_row') - F('seats_booked'))
+    
+    def not_sold_out(self):
+        return self.with_seats_left().filter(seats_left__gt=0)
+
 class Screening(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     hall = models.ForeignKey(CinemaHall, on_delete=models.CASCADE)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    seats_booked = models.PositiveIntegerField(default=0, editable=False)
+    
+    objects = ScreeningQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time'], name='screening_start_idx'),
+            models.Index(fields=['movie', 'start_time'], name='screening_movie_start_idx'),
+        ]
+    
+    def clean(self):
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError({'end_time': 'Сеанс должен заканчиваться позже, чем начинается.'})
+        if self.hall_id and self.start_time and self.end_time:
+            overlapping = Screening.objects.filter(
+                hall_id=self.hall_id, start_time__lt=self.end_time, end_time__gt=self.start_time
+            ).exclude(pk=self.pk).first()
+            if overlapping:
+                raise ValidationError(f'В этом зале в это время уже идёт сеанс: {overlapping}')
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Счётчик меняется только F-выражениями вместе с бронированиями,
+            # обычное сохранение не должно затирать его устаревшим значением
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'seats_booked'
+            ]
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.movie.title} - {self.start_time.strftime('%d.%m.%Y %H:%M')}"
@@ -53,6 +92,81 @@ class Booking(models.Model):
     
     class Meta:
         unique_together = ['screening', 'seat']
+        indexes = [
+            models.Index(fields=['user', '-booked_at', '-id'], name='booking_user_booked_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.screening} - {self.seat}"
+
+class SalesRollup(models.Model):
+    date = models.DateField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    hall = models.ForeignKey(CinemaHall, on_delete=models.CASCADE)
+    hour = models.PositiveSmallIntegerField(help_text="Час начала сеанса")
+    screenings = models.PositiveIntegerField(default=0)
+    seats_sold = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        unique_together = ['date', 'movie', 'hall', 'hour']
+        indexes = [
+            models.Index(fields=['date', 'movie'], name='rollup_date_movie_idx'),
+        ]
+    
+    @property
+    def occupancy(self):
+        return self.seats_sold / self.capacity if self.capacity else 0
+    
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00 - {self.movie_id}/{self.hall_id}"
+
+class RollupDirtyDay(models.Model):
+    date = models.DateField(unique=True)
+    marked_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return str(self.date)
+
+class ArchivedScreening(models.Model):
+    # Прошедший сеанс, перенесённый из Screening с тем же id. Вместимость
+    # зала сохраняется на момент архивации
+    id = models.BigIntegerField(primary_key=True)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    hall = models.ForeignKey(CinemaHall, on_delete=models.CASCADE)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    seats_booked = models.PositiveIntegerField(default=0)
+    capacity = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_time'], name='archived_screening_start_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.movie.title} - {self.start_time.strftime('%d.%m.%Y %H:%M')}"
+
+class ArchivedBooking(models.Model):
+    # Место хранится рядом и номером, без ссылки на Seat и проверки уникальности
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    screening = models.ForeignKey(ArchivedScreening, on_delete=models.CASCADE)
+    row = models.PositiveSmallIntegerField()
+    number = models.PositiveSmallIntegerField()
+    booked_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-booked_at', '-id'], name='archived_booking_user_idx'),
+        ]
+    
+    @property
+    def seat(self):
+        return f"Ряд {self.row}, Место {self.number}"
     
     def __str__(self):
-        return f"{self.user.username} - {self.screening} - {self.seat}"
\ No newline at end of file
+        return f"{self.user.username} - {self.screening} - {self.seat}"
@@ -0,0 +1,144 @@
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.db_routers import primary_reads
+
+PAGE_TIMEOUT = 60 * 60 * 24
+
+MOVIES = 'movies'
+SCREENINGS = 'screenings'
+
+
+def movie_screenings(movie_id):
+    return f'screenings:{movie_id}'
+
+
+def _generation_key(namespace):
+    return f'pagecache:generation:{namespace}'
+
+
+def generations(*namespaces):
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns() // 1000, None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    # Старые ключи страниц просто перестают запрашиваться и вытесняются сами
+    for namespace in namespaces:
+        try:
+            cache.incr(_generation_key(namespace))
+        except ValueError:
+            generations(namespace)
+
+
+def invalidate_on_commit(*namespaces):
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+def _count(event):
+    key = f'pagecache:stats:{event}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def stats():
+    found = cache.get_many(['pagecache:stats:hit', 'pagecache:stats:miss'])
+    hits = found.get('pagecache:stats:hit', 0)
+    misses = found.get('pagecache:stats:miss', 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 3) if total else None}
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Сообщения и данные пользователя делают страницу персональной
+    return 'messages' not in request.COOKIES
+
+
+def _cacheable(request):
+    return _cacheable_request(request) and not request.user.is_authenticated
+
+
+async def _acacheable(request):
+    return _cacheable_request(request) and not (await request.auser()).is_authenticated
+
+
+def _page_key(request, namespaces):
+    raw = '|'.join([request.get_full_path()] + [str(value) for value in generations(*namespaces)])
+    return 'pagecache:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _timeout(response):
+    # Страницы со списком будущих сеансов устаревают, когда ближайший из них начинается
+    expires = getattr(response, 'cache_until', None)
+    if expires is None:
+        return PAGE_TIMEOUT
+    return max(0, min(PAGE_TIMEOUT, int((expires - timezone.now()).total_seconds())))
+
+
+def _cached_response(key):
+    response = cache.get(key)
+    if response is not None:
+        _count('hit')
+        response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def _store_response(key, response):
+    _count('miss')
+    if response.status_code == 200 and not response.cookies and not response.streaming:
+        timeout = _timeout(response)
+        if timeout:
+            cache.set(key, response, timeout)
+    response['X-Page-Cache'] = 'MISS'
+    return response
+
+
+def cache_public_page(namespaces, bypass=None):
+    # bypass(request) -> True: страница не кэшируется (например, поиск с
+    # бесконечным числом вариантов запроса только вытеснял бы остальные).
+    # Промах, который попадёт в кэш, рендерится по основной базе: страница,
+    # собранная по отстающей реплике сразу после сброса, жила бы в кэше сутки
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            # Обращения к кэшу короткие и не касаются БД - выполняем их прямо
+            # в цикле событий, без перехода в поток на каждый вызов
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if (bypass and bypass(request)) or not await _acacheable(request):
+                    return await view(request, *args, **kwargs)
+                key = _page_key(request, namespaces(**kwargs))
+                response = _cached_response(key)
+                if response is None:
+                    with primary_reads():
+                        response = _store_response(key, await view(request, *args, **kwargs))
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (bypass and bypass(request)) or not _cacheable(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, namespaces(**kwargs))
+            response = _cached_response(key)
+            if response is None:
+                with primary_reads():
+                    response = _store_response(key, view(request, *args, **kwargs))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,217 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(values, direction):
+    raw = json.dumps([direction] + [_dump(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, *values = json.loads(raw)
+        values = [_load(value) for value in values]
+    except (ValueError, TypeError):
+        return None, None
+    if direction not in ('next', 'prev'):
+        return None, None
+    return values, direction
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _load(value):
+    return (parse_datetime(value) or value) if isinstance(value, str) else value
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_token, previous_token):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+# В отличие от Paginator не делает COUNT(*) и OFFSET: стоимость страницы не
+# зависит от её глубины. Последнее поле ordering должно быть уникальным.
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = per_page
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    def _after(self, values, reverse):
+        # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            name = self.fields[position]
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[position]})
+            for previous in range(position):
+                step &= Q(**{self.fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+    def _values(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def _coerce(self, values):
+        # Курсор приходит из адресной строки: значения приводим к типам полей,
+        # а испорченный курсор означает первую страницу
+        if values is None or len(values) != len(self.fields):
+            return None
+        opts = self.queryset.model._meta
+        try:
+            values = [opts.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        return None if any(value is None for value in values) else values
+
+    def _query(self, token):
+        values, direction = decode_cursor(token) if token else (None, None)
+        values = self._coerce(values)
+
+        reverse = values is not None and direction == 'prev'
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+        else:
+            ordering = self.ordering
+        return queryset.order_by(*ordering)[:self.per_page + 1], values is not None, reverse
+
+    def _page(self, rows, has_cursor, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_next, has_previous = has_cursor, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+
+        next_token = encode_cursor(self._values(rows[-1]), 'next') if rows and has_next else None
+        previous_token = encode_cursor(self._values(rows[0]), 'prev') if rows and has_previous else None
+        return KeysetPage(rows, next_token is not None, previous_token is not None, next_token, previous_token)
+
+    def get_page(self, token):
+        queryset, has_cursor, reverse = self._query(token)
+        return self._page(list(queryset), has_cursor, reverse)
+
+    async def aget_page(self, token):
+        queryset, has_cursor, reverse = self._query(token)
+        return self._page([row async for row in queryset], has_cursor, reverse)
+
+
+class EstimatedCountPaginator(Paginator):
+    # Точный COUNT(*) по миллионам строк дорог: для всей таблицы берём оценку
+    # из статистики БД, а с фильтрами считаем не дальше порога
+    count_limit = 10000
+    capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._table_estimate(queryset)
+            if estimate is not None:
+                return estimate
+
+        count = queryset.order_by()[:self.count_limit + 1].count()
+        if count <= self.count_limit:
+            return count
+        estimate = self._plan_estimate(queryset)
+        if estimate is not None:
+            return max(estimate, count)
+        # Сколько строк на самом деле, неизвестно: страницы дальше порога
+        # всё равно открываются, просто без ссылок на них
+        self.capped = True
+        return self.count_limit
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.capped or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if number <= self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def _table_estimate(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+                row = cursor.fetchone()
+                estimate = row[0] if row else None
+            elif connection.vendor == 'sqlite':
+                estimate = self._sqlite_estimate(cursor, connection, queryset.model)
+            else:
+                estimate = None
+        # Маленькую таблицу дешевле посчитать точно
+        if estimate is None or estimate < self.count_limit:
+            return None
+        return int(estimate)
+
+    def _sqlite_estimate(self, cursor, connection, model):
+        # Число строк из ANALYZE (первое число в stat), а без статистики -
+        # наибольший первичный ключ: поиск по rowid, без обхода таблицы
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone():
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [model._meta.db_table])
+            stats = [int(row[0].split()[0]) for row in cursor.fetchall() if row[0]]
+            if stats:
+                return max(stats)
+        cursor.execute(f'SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) FROM {connection.ops.quote_name(model._meta.db_table)}')
+        return cursor.fetchone()[0]
+
+    def _plan_estimate(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
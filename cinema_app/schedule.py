@@ -0,0 +1,167 @@
+import csv
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import mark_dirty
+from .models import CinemaHall, Movie, Screening
+from .pagecache import SCREENINGS, invalidate_on_commit, movie_screenings
+
+CONFLICT_EXISTING = 'existing'
+CONFLICT_PROPOSED = 'proposed'
+
+
+def cleaning_minutes():
+    return getattr(settings, 'SCREENING_CLEANING_MINUTES', 25)
+
+
+def screening_end(movie, start_time):
+    return start_time + timedelta(minutes=movie.duration + cleaning_minutes())
+
+
+def propose(movie, hall, start_time, price):
+    return Screening(
+        movie=movie, hall=hall, start_time=start_time,
+        end_time=screening_end(movie, start_time), price=price, seats_booked=0,
+    )
+
+
+class ScheduleConflict:
+    def __init__(self, screening, kind, other):
+        self.screening = screening
+        self.kind = kind
+        self.other = other
+
+    def message(self):
+        other = self.other
+        if self.kind == CONFLICT_EXISTING:
+            target = f'существующим сеансом #{other[0]} ({timezone.localtime(other[1]):%d.%m %H:%M}-{timezone.localtime(other[2]):%H:%M})'
+        else:
+            target = f'сеансом «{other.movie.title}» {timezone.localtime(other.start_time):%d.%m %H:%M} из того же пакета'
+        screening = self.screening
+        return (
+            f'{screening.hall.name}, {timezone.localtime(screening.start_time):%d.%m.%Y %H:%M} '
+            f'«{screening.movie.title}»: пересекается с {target}'
+        )
+
+
+class ScheduleResult:
+    def __init__(self, created=None, conflicts=None):
+        self.created = created or []
+        self.conflicts = conflicts or []
+
+
+def _existing_intervals(halls, start, end):
+    # Одним запросом: все сеансы этих залов, которые могут задеть окно пакета
+    intervals = {}
+    rows = (
+        Screening.objects.filter(hall__in=halls, start_time__lt=end, end_time__gt=start)
+        .order_by('hall_id', 'start_time').values_list('hall_id', 'id', 'start_time', 'end_time')
+    )
+    for hall_id, pk, start_time, end_time in rows:
+        intervals.setdefault(hall_id, []).append((pk, start_time, end_time))
+    return intervals
+
+
+def _existing_index(existing):
+    # Начала по возрастанию и префиксный максимум концов: сеанс [s, e) задевает
+    # существующие, если среди начавшихся раньше e самый поздний конец > s
+    starts, max_ends, holders = [], [], []
+    for row in existing:
+        starts.append(row[1])
+        if max_ends and max_ends[-1] >= row[2]:
+            max_ends.append(max_ends[-1])
+            holders.append(holders[-1])
+        else:
+            max_ends.append(row[2])
+            holders.append(row)
+    return starts, max_ends, holders
+
+
+def find_conflicts(proposed):
+    # Для каждого зала: сортировка пакета по началу и один проход с самым
+    # поздним концом среди принятых - O(n log n) вместо запроса на каждый сеанс
+    if not proposed:
+        return [], []
+    by_hall = {}
+    for screening in proposed:
+        by_hall.setdefault(screening.hall_id, []).append(screening)
+    window_start = min(screening.start_time for screening in proposed)
+    window_end = max(screening.end_time for screening in proposed)
+    existing = _existing_intervals(list(by_hall), window_start, window_end)
+
+    accepted, conflicts = [], []
+    for hall_id, screenings in by_hall.items():
+        starts, max_ends, holders = _existing_index(existing.get(hall_id, []))
+        latest = None
+        for screening in sorted(screenings, key=lambda item: (item.start_time, item.end_time)):
+            position = bisect_left(starts, screening.end_time)
+            if position and max_ends[position - 1] > screening.start_time:
+                conflicts.append(ScheduleConflict(screening, CONFLICT_EXISTING, holders[position - 1]))
+            elif latest is not None and latest.end_time > screening.start_time:
+                conflicts.append(ScheduleConflict(screening, CONFLICT_PROPOSED, latest))
+            else:
+                accepted.append(screening)
+                if latest is None or screening.end_time > latest.end_time:
+                    latest = screening
+    return accepted, conflicts
+
+
+def import_schedule(proposed, dry_run=False, batch_size=1000):
+    proposed = [screening for screening in proposed if screening.end_time > screening.start_time]
+    with transaction.atomic():
+        # Блокировка залов не даёт двум одновременным импортам разойтись
+        # между проверкой и вставкой (SQLite и так пишет по одному)
+        hall_ids = {screening.hall_id for screening in proposed}
+        list(CinemaHall.objects.select_for_update().filter(pk__in=hall_ids).values_list('pk', flat=True))
+
+        accepted, conflicts = find_conflicts(proposed)
+        if dry_run or not accepted:
+            return ScheduleResult(accepted if dry_run else [], conflicts)
+
+        created = Screening.objects.bulk_create(accepted, batch_size=batch_size)
+        # bulk_create обходит сигналы: кэш страниц и витрину обновляем сами
+        invalidate_on_commit(SCREENINGS, *{movie_screenings(screening.movie_id) for screening in created})
+        mark_dirty(*{screening.start_time for screening in created})
+    return ScheduleResult(created, conflicts)
+
+
+def copy_screenings(screenings, shift):
+    return [
+        propose(screening.movie, screening.hall, screening.start_time + shift, screening.price)
+        for screening in screenings.select_related('movie', 'hall')
+    ]
+
+
+def parse_csv(lines):
+    # Колонки: movie (ID или название), hall (ID или название),
+    # start (ГГГГ-ММ-ДД ЧЧ:ММ, местное время), price
+    movies = {str(movie.pk): movie for movie in Movie.objects.all()}
+    movies.update({movie.title: movie for movie in movies.values()})
+    halls = {str(hall.pk): hall for hall in CinemaHall.objects.all()}
+    halls.update({hall.name: hall for hall in halls.values()})
+
+    proposed, errors = [], []
+    for line, row in enumerate(csv.DictReader(lines), start=2):
+        movie = movies.get((row.get('movie') or '').strip())
+        hall = halls.get((row.get('hall') or '').strip())
+        try:
+            start_time = datetime.fromisoformat((row.get('start') or '').strip())
+            if timezone.is_naive(start_time):
+                start_time = timezone.make_aware(start_time)
+            price = Decimal((row.get('price') or '').strip())
+        except (ValueError, InvalidOperation):
+            start_time = price = None
+        if movie is None:
+            errors.append(f'Строка {line}: фильм «{row.get("movie")}» не найден')
+        elif hall is None:
+            errors.append(f'Строка {line}: зал «{row.get("hall")}» не найден')
+        elif start_time is None:
+            errors.append(f'Строка {line}: некорректные начало или цена')
+        else:
+            proposed.append(propose(movie, hall, start_time, price))
+    return proposed, errors
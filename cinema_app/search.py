@@ -0,0 +1,123 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Case, Q, When
+
+from .models import Movie
+
+FTS_TABLE = 'cinema_app_movie_fts'
+# Совпадение в названии весит больше, чем в описании
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_QUERY_TERMS = 8
+AUTOCOMPLETE_LIMIT = 8
+
+_WORD = re.compile(r'\w+')
+# Стеммера для русского в FTS5 нет: отрезаем гласное окончание и ищем по
+# префиксу основы, чтобы "дюна" находила и "дюну", а "тёмный" - "тёмные"
+_ENDING = re.compile(r'[аеиоуыэюяйь]+$')
+MIN_STEM_LENGTH = 3
+
+
+def _read_connection():
+    return connections[router.db_for_read(Movie)]
+
+
+def _write_connection():
+    return connections[router.db_for_write(Movie)]
+
+
+def is_available():
+    return _read_connection().vendor == 'sqlite'
+
+
+def _normalize(text):
+    # unicode61 не снимает "диакритику" с кириллицы: ё и е приводим сами
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _stem(term):
+    stem = _ENDING.sub('', term)
+    return stem if len(stem) >= MIN_STEM_LENGTH else term
+
+
+def _match_expression(query, column=None, stem=False):
+    # Каждое слово - префиксный терм в кавычках, поэтому операторы FTS5
+    # из пользовательского ввода не интерпретируются
+    terms = _WORD.findall(_normalize(query).lower())[:MAX_QUERY_TERMS]
+    if stem:
+        terms = [_stem(term) for term in terms]
+    if not terms:
+        return None
+    expression = ' '.join(f'"{term}"*' for term in terms)
+    return f'{column} : ({expression})' if column else expression
+
+
+def index_movie(movie):
+    connection = _write_connection()
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [movie.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [movie.pk, _normalize(movie.title), _normalize(movie.description)],
+        )
+
+
+def remove_movie(movie_id):
+    connection = _write_connection()
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [movie_id])
+
+
+def rebuild_index():
+    connection = _write_connection()
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        rows = Movie.objects.using(connection.alias).values_list('pk', 'title', 'description').iterator(chunk_size=2000)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [(pk, _normalize(title), _normalize(description)) for pk, title, description in rows],
+        )
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def _ranked_ids(expression, limit):
+    with _read_connection().cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s',
+            [expression, TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _in_rank_order(queryset, ids):
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(Case(*(When(pk=pk, then=position) for position, pk in enumerate(ids))))
+
+
+def search_movies(query, limit=50, queryset=None):
+    queryset = Movie.objects.all() if queryset is None else queryset
+    expression = _match_expression(query, stem=True)
+    if expression is None:
+        return queryset.none()
+    if not is_available():
+        return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query)).order_by('title')[:limit]
+    return _in_rank_order(queryset, _ranked_ids(expression, limit))
+
+
+def autocomplete(prefix, limit=AUTOCOMPLETE_LIMIT):
+    expression = _match_expression(prefix, column='title')
+    if expression is None:
+        return []
+    if not is_available():
+        return list(Movie.objects.filter(title__istartswith=prefix).order_by('title').values_list('pk', 'title')[:limit])
+    return list(_in_rank_order(Movie.objects.all(), _ranked_ids(expression, limit)).values_list('pk', 'title'))
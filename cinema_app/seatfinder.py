@@ -0,0 +1,52 @@
+from .holds import get_holds
+from .seatmap import get_seatmap
+
+# Лучший ряд - чуть дальше середины зала; смещение от центра ряда и от
+# лучшего ряда нормируются на размеры зала и складываются с этим весом
+PREFERRED_ROW_POSITION = 0.6
+ROW_WEIGHT = 1.0
+
+
+def _preferred_row(rows):
+    return max(1, round(rows * PREFERRED_ROW_POSITION))
+
+
+def find_best_seats(seatmap, count, blocked=()):
+    # Скользящее окно по каждому ряду: число недоступных мест в окне
+    # обновляется при сдвиге на одно место, весь зал проходится за O(мест)
+    if not 1 <= count <= seatmap.seats_per_row:
+        return None
+
+    preferred_row = _preferred_row(seatmap.rows)
+    center = (seatmap.seats_per_row + 1) / 2
+    best, best_score = None, None
+    for row in range(1, seatmap.rows + 1):
+        row_penalty = ROW_WEIGHT * abs(row - preferred_row) / seatmap.rows
+        if best_score is not None and row_penalty >= best_score:
+            continue
+
+        taken = [seatmap.is_booked(row, number) or (row, number) in blocked for number in range(1, seatmap.seats_per_row + 1)]
+        in_window = sum(taken[:count])
+        for start in range(1, seatmap.seats_per_row - count + 2):
+            if start > 1:
+                in_window += taken[start + count - 2] - taken[start - 2]
+            if in_window:
+                continue
+            window_center = start + (count - 1) / 2
+            score = row_penalty + abs(window_center - center) / seatmap.seats_per_row
+            if best_score is None or score < best_score:
+                best, best_score = (row, start), score
+
+    if best is None:
+        return None
+    row, start = best
+    return [(row, number) for number in range(start, start + count)]
+
+
+def seats_held_by_others(holds, user_id):
+    return {key for key, (owner, _) in holds.items() if owner != user_id}
+
+
+def best_seats_for(screening, count, user_id=None, exclude=()):
+    blocked = seats_held_by_others(get_holds(screening.id), user_id) | set(exclude)
+    return find_best_seats(get_seatmap(screening), count, blocked)
@@ -0,0 +1,200 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Booking
+
+# Битовая карта живёт недолго: любое рассогласование с БД само исправится
+CACHE_TIMEOUT = 60 * 5
+# Карту сеанса правят несколько воркеров сразу - под короткой блокировкой
+MAP_LOCK_SECONDS = 1
+MAP_LOCK_STEP = 0.005
+
+
+def _cache_key(screening_id, generation, rows, seats_per_row):
+    return f'seatmap:{screening_id}:{generation}:{rows}x{seats_per_row}'
+
+
+def _version_key(screening_id):
+    return f'seatmap:{screening_id}:version'
+
+
+def _generation_key(screening_id):
+    return f'seatmap:{screening_id}:generation'
+
+
+def _counter(key):
+    value = cache.get(key)
+    if value is None:
+        # Стартуем от текущего времени, чтобы после вытеснения из кэша
+        # счётчик не повторил уже выданные значения
+        cache.add(key, time.time_ns() // 1000, None)
+        value = cache.get(key)
+    return value
+
+
+def _increment(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _counter(key)
+
+
+def get_version(screening_id):
+    return _counter(_version_key(screening_id))
+
+
+def bump_version(screening_id):
+    return _increment(_version_key(screening_id))
+
+
+def parse_seat_key(value):
+    try:
+        row, number = value.split('-', 1)
+        return int(row), int(number)
+    except (AttributeError, ValueError):
+        return None
+
+
+class SeatMap:
+    def __init__(self, rows, seats_per_row, bits=None):
+        self.rows = rows
+        self.seats_per_row = seats_per_row
+        size = (rows * seats_per_row + 7) // 8
+        self.bits = bytearray(bits) if bits is not None else bytearray(size)
+
+    def contains(self, row, number):
+        return 1 <= row <= self.rows and 1 <= number <= self.seats_per_row
+
+    def _index(self, row, number):
+        if not self.contains(row, number):
+            raise IndexError(f'Место {row}-{number} вне зала {self.rows}x{self.seats_per_row}')
+        return (row - 1) * self.seats_per_row + (number - 1)
+
+    def is_booked(self, row, number):
+        index = self._index(row, number)
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def book(self, row, number):
+        index = self._index(row, number)
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def release(self, row, number):
+        index = self._index(row, number)
+        self.bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def booked_count(self):
+        return int.from_bytes(self.bits, 'little').bit_count()
+
+    def available_count(self):
+        return self.rows * self.seats_per_row - self.booked_count()
+
+    def matrix(self, held=(), selected=()):
+        matrix = []
+        index = 0
+        for row in range(1, self.rows + 1):
+            seats = []
+            for number in range(1, self.seats_per_row + 1):
+                if self.bits[index >> 3] & (1 << (index & 7)):
+                    state = 'booked'
+                elif (row, number) in selected:
+                    state = 'selected'
+                elif (row, number) in held:
+                    state = 'held'
+                else:
+                    state = 'available'
+                seats.append((number, state))
+                index += 1
+            matrix.append((row, seats))
+        return matrix
+
+
+def _booked_seats(screening):
+    return Booking.objects.filter(screening=screening).values_list('seat__row', 'seat__number')
+
+
+def _fill(seatmap, booked):
+    for row, number in booked:
+        if seatmap.contains(row, number):
+            seatmap.book(row, number)
+    return seatmap
+
+
+def _current_key(screening):
+    # Карта хранится под номером поколения: если править её на месте не
+    # вышло, читатели переходят на новый ключ, а карта, собранная по старым
+    # данным, остаётся под старым
+    hall = screening.hall
+    return _cache_key(screening.id, _counter(_generation_key(screening.id)), hall.rows, hall.seats_per_row)
+
+
+def get_seatmap(screening):
+    hall = screening.hall
+    key = _current_key(screening)
+    bits = cache.get(key)
+    if bits is not None:
+        return SeatMap(hall.rows, hall.seats_per_row, bits)
+
+    seatmap = _fill(SeatMap(hall.rows, hall.seats_per_row), _booked_seats(screening))
+    # add, а не set: карту, которую уже поправила бронь, не затираем
+    cache.add(key, bytes(seatmap.bits), CACHE_TIMEOUT)
+    return seatmap
+
+
+async def aget_seatmap(screening):
+    hall = screening.hall
+    key = _current_key(screening)
+    bits = cache.get(key)
+    if bits is not None:
+        return SeatMap(hall.rows, hall.seats_per_row, bits)
+
+    seatmap = _fill(SeatMap(hall.rows, hall.seats_per_row), [seat async for seat in _booked_seats(screening)])
+    cache.add(key, bytes(seatmap.bits), CACHE_TIMEOUT)
+    return seatmap
+
+
+def _lock_map(screening_id):
+    lock_key = f'seatmap:{screening_id}:lock'
+    deadline = time.monotonic() + MAP_LOCK_SECONDS
+    while not cache.add(lock_key, 1, MAP_LOCK_SECONDS):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(MAP_LOCK_STEP)
+    return lock_key
+
+
+def _patch(screening, seats, booked):
+    lock_key = _lock_map(screening.id)
+    if lock_key is None:
+        return False
+    try:
+        key = _current_key(screening)
+        bits = cache.get(key)
+        if bits is None:
+            return False
+        seatmap = SeatMap(screening.hall.rows, screening.hall.seats_per_row, bits)
+        for row, number in seats:
+            if not seatmap.contains(row, number):
+                continue
+            if booked:
+                seatmap.book(row, number)
+            else:
+                seatmap.release(row, number)
+        cache.set(key, bytes(seatmap.bits), CACHE_TIMEOUT)
+        return True
+    finally:
+        cache.delete(lock_key)
+
+
+def update_seatmap(screening, seats, booked):
+    seats = list(seats)
+
+    def apply():
+        # Карты нет в кэше или блокировку не взять - начинаем новое поколение:
+        # карта, которую читатель собрал до фиксации, не попадёт в оборот
+        if not _patch(screening, seats, booked):
+            _increment(_generation_key(screening.id))
+        bump_version(screening.id)
+
+    transaction.on_commit(apply)
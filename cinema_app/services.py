@@ -0,0 +1,110 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .analytics import mark_dirty
+from .holds import held_by_others, release_seats
+from .models import Booking, Screening, Seat
+from .pagecache import SCREENINGS, invalidate_on_commit, movie_screenings
+from .seatfinder import best_seats_for
+from .seatmap import update_seatmap
+
+MAX_SEATS_PER_BOOKING = 10
+BEST_SEATS_ATTEMPTS = 3
+
+CONFLICT_BOOKED = 'booked'
+CONFLICT_HELD = 'held'
+CONFLICT_MISSING = 'missing'
+
+CONFLICT_MESSAGES = {
+    CONFLICT_BOOKED: 'уже забронировано',
+    CONFLICT_HELD: 'удерживается другим покупателем',
+    CONFLICT_MISSING: 'не существует',
+}
+
+
+class BookingResult:
+    def __init__(self, bookings=None, conflicts=None):
+        self.bookings = bookings or []
+        self.conflicts = conflicts or {}
+
+    @property
+    def ok(self):
+        return bool(self.bookings) and not self.conflicts
+
+    def conflict_messages(self):
+        return [
+            f'Ряд {row}, Место {number}: {CONFLICT_MESSAGES[reason]}'
+            for (row, number), reason in sorted(self.conflicts.items())
+        ]
+
+
+def _booked_keys(screening, seats):
+    return set(
+        Booking.objects.filter(screening=screening, seat__in=seats)
+        .values_list('seat__row', 'seat__number')
+    )
+
+
+def book_seats(user, screening, seat_keys):
+    seat_keys = list(dict.fromkeys(seat_keys))
+    if not seat_keys:
+        return BookingResult()
+
+    lookup = Q()
+    for row, number in seat_keys:
+        lookup |= Q(row=row, number=number)
+    seats = {(seat.row, seat.number): seat for seat in Seat.objects.filter(lookup, hall_id=screening.hall_id)}
+
+    conflicts = {key: CONFLICT_MISSING for key in seat_keys if key not in seats}
+    conflicts.update((key, CONFLICT_HELD) for key in held_by_others(screening.id, user.id, seats))
+    if conflicts:
+        return BookingResult(conflicts=conflicts)
+
+    try:
+        with transaction.atomic():
+            taken = _booked_keys(screening, seats.values())
+            if taken:
+                return BookingResult(conflicts={key: CONFLICT_BOOKED for key in taken})
+
+            bookings = Booking.objects.bulk_create([
+                Booking(user=user, screening=screening, seat=seats[key]) for key in seat_keys
+            ])
+            change_seats_booked(screening.id, len(bookings))
+            mark_dirty(screening.start_time)
+            update_seatmap(screening, seat_keys, True)
+            invalidate_on_commit(SCREENINGS, movie_screenings(screening.movie_id))
+    except IntegrityError:
+        # Другой покупатель успел между проверкой и вставкой
+        taken = _booked_keys(screening, seats.values()) or set(seat_keys)
+        return BookingResult(conflicts={key: CONFLICT_BOOKED for key in taken})
+
+    release_seats(screening.id, user.id, seat_keys)
+    return BookingResult(bookings=bookings)
+
+
+def book_best_seats(user, screening, count):
+    result, exclude = BookingResult(), set()
+    for _ in range(BEST_SEATS_ATTEMPTS):
+        seat_keys = best_seats_for(screening, count, user.id, exclude)
+        if seat_keys is None:
+            break
+        result = book_seats(user, screening, seat_keys)
+        if result.ok:
+            break
+        # Места заняли между подбором и вставкой - подбираем заново без них
+        exclude.update(result.conflicts)
+    return result
+
+
+def change_seats_booked(screening_id, delta):
+    Screening.objects.filter(pk=screening_id).update(seats_booked=F('seats_booked') + delta)
+
+
+def recount_seats_booked(screenings=None):
+    screenings = Screening.objects.all() if screenings is None else screenings
+    booked = Coalesce(Subquery(
+        Booking.objects.filter(screening=OuterRef('pk'))
+        .values('screening').annotate(total=Count('id')).values('total')
+    ), 0)
+    return screenings.annotate(actual=booked).exclude(seats_booked=F('actual')).update(seats_booked=booked)
@@ -0,0 +1,92 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .analytics import mark_dirty
+from .models import Booking, CinemaHall, Movie, Screening
+from .pagecache import MOVIES, SCREENINGS, invalidate_on_commit, movie_screenings
+from .search import index_movie, remove_movie
+from .seatmap import update_seatmap
+from .services import change_seats_booked
+from .thumbnails import delete_thumbs, schedule_thumbs
+
+
+def _booking_screening(booking):
+    return Screening.objects.select_related('hall').filter(pk=booking.screening_id).first()
+
+
+def _deleted_with_screening(origin):
+    # Брони удаляются каскадом вместе с сеансом: сеанс исчезает целиком,
+    # его счётчики и кэши обновит screening_changed
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Screening, CinemaHall, Movie)
+
+
+@receiver(post_save, sender=Booking)
+def booking_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    screening = _booking_screening(instance)
+    if screening:
+        change_seats_booked(screening.id, 1)
+        mark_dirty(screening.start_time)
+        update_seatmap(screening, [(instance.seat.row, instance.seat.number)], True)
+        invalidate_on_commit(SCREENINGS, movie_screenings(screening.movie_id))
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_with_screening(origin):
+        return
+    screening = _booking_screening(instance)
+    if screening:
+        change_seats_booked(screening.id, -1)
+        mark_dirty(screening.start_time)
+        update_seatmap(screening, [(instance.seat.row, instance.seat.number)], False)
+        invalidate_on_commit(SCREENINGS, movie_screenings(screening.movie_id))
+
+
+@receiver(pre_save, sender=Screening)
+def screening_rescheduled(sender, instance, **kwargs):
+    # Перенесённый сеанс нужно убрать и из витрины за прежний день
+    instance._previous_start = (
+        Screening.objects.filter(pk=instance.pk).values_list('start_time', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Screening)
+def screening_changed(sender, instance, **kwargs):
+    invalidate_on_commit(SCREENINGS, movie_screenings(instance.movie_id))
+    mark_dirty(instance.start_time, getattr(instance, '_previous_start', None))
+
+
+@receiver(pre_save, sender=Movie)
+def movie_poster_replaced(sender, instance, **kwargs):
+    previous = Movie.objects.filter(pk=instance.pk).values('poster', 'poster_thumbs').first() if instance.pk else None
+    old_poster = previous['poster'] if previous else None
+    instance._poster_changed = (old_poster or '') != (instance.poster.name or '')
+    if instance._poster_changed:
+        instance.poster_thumbs = []
+        if old_poster:
+            delete_thumbs(old_poster, previous['poster_thumbs'])
+
+
+@receiver(post_save, sender=Movie)
+def movie_poster_saved(sender, instance, **kwargs):
+    if instance.poster and getattr(instance, '_poster_changed', False):
+        schedule_thumbs(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    invalidate_on_commit(MOVIES)
+
+
+@receiver(post_save, sender=Movie)
+def movie_indexed(sender, instance, **kwargs):
+    index_movie(instance)
+
+
+@receiver(post_delete, sender=Movie)
+def movie_unindexed(sender, instance, **kwargs):
+    remove_movie(instance.pk)
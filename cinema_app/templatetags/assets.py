@@ -0,0 +1,31 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from cinema_app.assets import VENDOR_ASSETS, is_vendored
+
+register = template.Library()
+
+
+def _source(name):
+    # Пока файлы не скачаны командой vendor_assets, берём их с CDN с проверкой SRI
+    path, url, integrity = VENDOR_ASSETS[name]
+    if is_vendored(name):
+        return static(path), None
+    return url, integrity
+
+
+@register.simple_tag
+def vendor_css(name):
+    url, integrity = _source(name)
+    if integrity:
+        return format_html('<link href="{}" rel="stylesheet" integrity="{}" crossorigin="anonymous">', url, integrity)
+    return format_html('<link href="{}" rel="stylesheet">', url)
+
+
+@register.simple_tag
+def vendor_js(name):
+    url, integrity = _source(name)
+    if integrity:
+        return format_html('<script src="{}" integrity="{}" crossorigin="anonymous"></script>', url, integrity)
+    return format_html('<script src="{}"></script>', url)
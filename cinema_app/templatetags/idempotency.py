@@ -0,0 +1,12 @@
+from django import template
+from django.utils.html import format_html
+
+from cinema_app.idempotency import FIELD_NAME, new_key
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_field():
+    # Новый ключ для каждой формы: повторная отправка той же формы - повтор
+    return format_html('<input type="hidden" name="{}" value="{}">', FIELD_NAME, new_key())
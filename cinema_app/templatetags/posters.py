@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from cinema_app.thumbnails import THUMB_FORMATS, thumb_url
+
+register = template.Library()
+
+IMAGE_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+
+@register.simple_tag
+def poster_img(movie, sizes, css_class='', style=''):
+    if not movie.poster:
+        return ''
+
+    widths = sorted(movie.poster_thumbs or [])
+    if not widths:
+        # Копии ещё готовятся в фоне - отдаём оригинал
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" style="{}" loading="lazy" decoding="async">',
+            movie.poster.url, css_class, movie.title, style,
+        )
+
+    name = movie.poster.name
+    srcsets = {
+        extension: ', '.join(f'{thumb_url(name, width, extension)} {width}w' for width in widths)
+        for extension, _, _ in THUMB_FORMATS
+    }
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((IMAGE_TYPES[extension], srcset, sizes) for extension, srcset in srcsets.items() if extension != 'jpg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy" decoding="async"></picture>',
+        sources, thumb_url(name, widths[-1], 'jpg'), srcsets['jpg'], sizes, css_class, movie.title, style,
+    )
@@ -0,0 +1,1049 @@
+import asyncio
+import contextlib
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+import load_demo_data
+from core.db_routers import REPLICA_ALIAS, ReplicaRouter, read_from_replica
+from core.staticfiles import _pick_encoding, serve as serve_static
+
+from . import admission, availability, benchmarks
+from .admin import LargeTableAdmin, SeatAdmin
+from .analytics import build_rollups, rollup_totals
+from .archive import archive_screenings, default_cutoff
+from .assets import VENDOR_ASSETS, is_vendored
+from .holds import _seat_key, get_holds, hold_seats, release_seats, user_holds
+from .idempotency import FIELD_NAME
+from .middleware import _install_wrapper
+from .models import (
+    ArchivedBooking, ArchivedScreening, Booking, CinemaHall, Movie, RollupDirtyDay, SalesRollup, Screening, Seat,
+)
+from .pagecache import MOVIES, cache_public_page
+from .pagination import EstimatedCountPaginator, KeysetPaginator, encode_cursor
+from .seatmap import SeatMap, _current_key, _patch, get_seatmap
+from .services import CONFLICT_BOOKED, BookingResult, book_seats, recount_seats_booked
+from .templatetags.assets import vendor_css
+from .thumbnails import THUMB_FORMATS, generate_thumbs, thumb_name
+
+
+# SQLite до 3.36 пишет "SCAN TABLE x", новее - "SCAN x"
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+# Манифест появляется только после collectstatic, в тестах ссылки на статику без хэша
+PLAIN_STATIC = override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+def clear_caches():
+    for alias in caches:
+        caches[alias].clear()
+
+
+def seat(screening, row, number):
+    return Seat.objects.get(hall=screening.hall, row=row, number=number)
+
+
+def create_screening(rows=5, seats_per_row=8, start=None, hall=None, movie=None):
+    movie = movie or Movie.objects.create(title='Тестовый фильм', description='Описание', duration=100)
+    if hall is None:
+        hall = CinemaHall.objects.create(name='Зал 1', rows=rows, seats_per_row=seats_per_row)
+        Seat.objects.bulk_create([
+            Seat(hall=hall, row=row, number=number)
+            for row in range(1, hall.rows + 1) for number in range(1, hall.seats_per_row + 1)
+        ])
+    start = start or timezone.now() + timedelta(days=1)
+    return Screening.objects.create(
+        movie=movie, hall=hall, start_time=start, end_time=start + timedelta(minutes=movie.duration), price=300,
+    )
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.users = [User.objects.create_user(f'user{i}', password='pass') for i in range(self.THREADS)]
+
+    def test_same_seats_booked_once(self):
+        seat_keys = [(1, 1), (1, 2)]
+        barrier = threading.Barrier(self.THREADS)
+        results = [None] * self.THREADS
+
+        def book(index):
+            try:
+                screening = Screening.objects.select_related('hall').get(pk=self.screening.pk)
+                barrier.wait()
+                results[index] = book_seats(self.users[index], screening, seat_keys)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(1 for result in results if result.ok), 1)
+        for row, number in seat_keys:
+            self.assertEqual(Booking.objects.filter(screening=self.screening, seat__row=row, seat__number=number).count(), 1)
+        self.screening.refresh_from_db()
+        self.assertEqual(self.screening.seats_booked, Booking.objects.filter(screening=self.screening).count())
+        self.assertEqual(self.screening.seats_booked, len(seat_keys))
+
+
+class SeatMapTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.users = [User.objects.create_user(f'user{i}', password='pass') for i in range(2)]
+
+    def test_bookings_from_both_paths_reach_cached_map(self):
+        self.assertEqual(get_seatmap(self.screening).booked_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            book_seats(self.users[0], self.screening, [(1, 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(user=self.users[1], screening=self.screening, seat=seat(self.screening, 1, 2))
+
+        seatmap = get_seatmap(self.screening)
+        self.assertTrue(seatmap.is_booked(1, 1))
+        self.assertTrue(seatmap.is_booked(1, 2))
+        self.assertEqual(seatmap.booked_count(), 2)
+
+    def test_stale_map_written_after_booking_is_not_read(self):
+        # Читатель собрал карту до брони и сохранил её уже после фиксации
+        stale_key = _current_key(self.screening)
+        with self.captureOnCommitCallbacks(execute=True):
+            book_seats(self.users[0], self.screening, [(2, 3)])
+        cache.set(stale_key, bytes(SeatMap(self.screening.hall.rows, self.screening.hall.seats_per_row).bits))
+
+        self.assertTrue(get_seatmap(self.screening).is_booked(2, 3))
+
+    def test_booking_patches_cached_map_in_place(self):
+        get_seatmap(self.screening)
+        key = _current_key(self.screening)
+        with self.captureOnCommitCallbacks(execute=True):
+            book_seats(self.users[0], self.screening, [(1, 1), (1, 2)])
+        booking = Booking.objects.get(seat__row=1, seat__number=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+
+        self.assertEqual(_current_key(self.screening), key)
+        with self.assertNumQueries(0):
+            seatmap = get_seatmap(self.screening)
+        self.assertFalse(seatmap.is_booked(1, 1))
+        self.assertTrue(seatmap.is_booked(1, 2))
+
+    def test_concurrent_patches_keep_every_seat(self):
+        get_seatmap(self.screening)
+        numbers = range(1, self.screening.hall.seats_per_row + 1)
+        threads = [threading.Thread(target=_patch, args=(self.screening, [(4, number)], True)) for number in numbers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        seatmap = get_seatmap(self.screening)
+        self.assertTrue(all(seatmap.is_booked(4, number) for number in numbers))
+
+    def test_cascade_delete_does_not_run_per_booking_work(self):
+        def delete_queries(bookings):
+            screening = create_screening(hall=self.screening.hall, movie=self.screening.movie)
+            Booking.objects.bulk_create([
+                Booking(user=self.users[0], screening=screening, seat=seat(screening, 3, number))
+                for number in range(1, bookings + 1)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                screening.delete()
+            return len(queries)
+
+        self.assertEqual(delete_queries(2), delete_queries(6))
+        self.assertEqual(Booking.objects.count(), 0)
+
+
+class SeatCounterTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening(rows=1, seats_per_row=3)
+        self.user = User.objects.create_user('buyer', password='pass')
+
+    def seats_booked(self):
+        return Screening.objects.values_list('seats_booked', flat=True).get(pk=self.screening.pk)
+
+    def test_counter_follows_bookings_and_cancellations(self):
+        book_seats(self.user, self.screening, [(1, 1), (1, 2)])
+        booking = Booking.objects.create(user=self.user, screening=self.screening, seat=seat(self.screening, 1, 3))
+        self.assertEqual(self.seats_booked(), 3)
+
+        booking.delete()
+        self.assertEqual(self.seats_booked(), 2)
+
+    def test_saving_stale_screening_keeps_counter(self):
+        stale = Screening.objects.get(pk=self.screening.pk)
+        book_seats(self.user, self.screening, [(1, 1)])
+        stale.price = 400
+        stale.save()
+
+        self.assertEqual(self.seats_booked(), 1)
+
+    def test_sold_out_screenings_are_hidden(self):
+        book_seats(self.user, self.screening, [(1, 1), (1, 2)])
+        self.assertEqual(Screening.objects.with_seats_left().get(pk=self.screening.pk).seats_left, 1)
+        self.assertTrue(Screening.objects.not_sold_out().filter(pk=self.screening.pk).exists())
+
+        book_seats(self.user, self.screening, [(1, 3)])
+        self.assertFalse(Screening.objects.not_sold_out().filter(pk=self.screening.pk).exists())
+
+    def test_recount_repairs_drift(self):
+        book_seats(self.user, self.screening, [(1, 1)])
+        Screening.objects.filter(pk=self.screening.pk).update(seats_booked=3)
+
+        self.assertEqual(recount_seats_booked(), 1)
+        self.assertEqual(self.seats_booked(), 1)
+        self.assertEqual(recount_seats_booked(), 0)
+
+
+@PLAIN_STATIC
+class PageCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening(rows=1, seats_per_row=2)
+        self.user = User.objects.create_user('buyer', password='pass')
+        self.url = reverse('screening_list_by_movie', args=[self.screening.movie_id])
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_booking_commit_invalidates_cached_pages(self):
+        self.assertContains(self.client.get(self.url), self.screening.movie.title)
+        with self.captureOnCommitCallbacks(execute=True):
+            book_seats(self.user, self.screening, [(1, 1), (1, 2)])
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertEqual(list(response.context['screenings']), [])
+
+    def test_uncommitted_booking_keeps_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=False):
+            book_seats(self.user, self.screening, [(1, 1)])
+
+        self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'HIT')
+
+    def test_cache_fill_reads_primary(self):
+        router = ReplicaRouter()
+
+        @read_from_replica
+        @cache_public_page(lambda: [MOVIES])
+        def view(request):
+            return HttpResponse(str(router.db_for_read(Movie)))
+
+        request = RequestFactory().get('/replica-page/')
+        request.user = AnonymousUser()
+        self.assertEqual(view(request).content, b'None')
+        request.user = self.user
+        self.assertEqual(view(request).content, REPLICA_ALIAS.encode())
+
+    def test_logged_in_user_bypasses_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        self.assertNotIn('X-Page-Cache', self.client.get(self.url))
+
+
+@PLAIN_STATIC
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    CHECKED_TABLES = (Screening._meta.db_table, Booking._meta.db_table)
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('viewer', password='pass')
+        self.screening = create_screening()
+        Booking.objects.create(user=self.user, screening=self.screening, seat=seat(self.screening, 1, 1))
+        self.client.force_login(self.user)
+
+    def _plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.extend((query['sql'], row[-1]) for row in cursor.fetchall())
+        return plans
+
+    def test_hot_pages_use_indexes(self):
+        urls = [
+            reverse('home'),
+            reverse('screening_list'),
+            reverse('screening_list_by_movie', args=[self.screening.movie_id]),
+            reverse('booking_list'),
+        ]
+        details = []
+        for url in urls:
+            for sql, detail in self._plans(url):
+                with self.subTest(url=url, sql=sql):
+                    scan = FULL_SCAN.match(detail)
+                    self.assertFalse(scan and scan[1] in self.CHECKED_TABLES, f'Полное сканирование: {detail}')
+                details.append(detail)
+
+        plan = '\n'.join(details)
+        for index in ('screening_start_idx', 'screening_movie_start_idx', 'booking_user_booked_idx'):
+            self.assertIn(index, plan)
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.user = User.objects.create_user('viewer', password='pass')
+        self.url = reverse('seat_availability', args=[self.screening.id])
+
+    def book(self, row, number):
+        with self.captureOnCommitCallbacks(execute=True):
+            book_seats(self.user, self.screening, [(row, number)])
+
+    def test_unchanged_map_answers_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_booking_and_hold_change_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.book(1, 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        hold_seats(self.screening.id, self.user.id + 1, [(2, 2)])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['held'], [[2, 2]])
+
+    def test_stream_under_wsgi_sends_single_snapshot(self):
+        response = self.client.get(reverse('seat_availability_stream', args=[self.screening.id]))
+        content = response.content.decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(content.startswith(f'retry: {availability.STREAM_RETRY_MS}\n'))
+        self.assertEqual(content.count('event: snapshot'), 1)
+
+    @mock.patch.object(availability, 'STREAM_POLL_SECONDS', 0)
+    async def test_stream_sends_delta_after_booking(self):
+        screening = await Screening.objects.select_related('hall').aget(pk=self.screening.pk)
+        events = availability.stream_events(screening)
+        self.assertIn('event: snapshot', await asyncio.wait_for(anext(events), 5))
+
+        await sync_to_async(self.book)(3, 4)
+        event = await asyncio.wait_for(anext(events), 5)
+        await events.aclose()
+        self.assertTrue(event.startswith('event: delta'))
+        self.assertIn('"3-4":"booked"', event)
+
+
+class HoldTests(SimpleTestCase):
+    SCREENING_ID = 1
+    THREADS = 8
+
+    def setUp(self):
+        clear_caches()
+
+    def test_concurrent_holds_keep_every_index_entry(self):
+        barrier = threading.Barrier(self.THREADS)
+
+        def hold(user_id):
+            barrier.wait()
+            for number in range(1, 6):
+                self.assertEqual(hold_seats(self.SCREENING_ID, user_id, [(user_id, number)]), set())
+
+        threads = [threading.Thread(target=hold, args=(user_id,)) for user_id in range(1, self.THREADS + 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        holds = get_holds(self.SCREENING_ID)
+        self.assertEqual(len(holds), self.THREADS * 5)
+        for user_id in range(1, self.THREADS + 1):
+            self.assertEqual(set(user_holds(self.SCREENING_ID, user_id)), {(user_id, number) for number in range(1, 6)})
+
+    def test_user_holds_follow_seat_keys(self):
+        hold_seats(self.SCREENING_ID, 1, [(1, 1), (1, 2)])
+        # Холд истёк и место перехватил другой покупатель, а индекс ещё помнит старого
+        caches['holds'].set(_seat_key(self.SCREENING_ID, 1, 2), 2)
+        self.assertEqual(set(user_holds(self.SCREENING_ID, 1)), {(1, 1)})
+
+        release_seats(self.SCREENING_ID, 1, [(1, 1)])
+        self.assertEqual(user_holds(self.SCREENING_ID, 1), {})
+
+    def test_holds_survive_default_cache_culling(self):
+        hold_seats(self.SCREENING_ID, 1, [(1, 1), (1, 2)])
+        for i in range(1000):
+            cache.set(f'page:{i}', i)
+
+        self.assertEqual(set(user_holds(self.SCREENING_ID, 1)), {(1, 1), (1, 2)})
+
+
+@PLAIN_STATIC
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        first = create_screening()
+        start = first.start_time
+        for hours in range(3, 24, 3):
+            create_screening(hall=first.hall, movie=first.movie, start=start + timedelta(hours=hours))
+
+    def test_bogus_cursor_shows_first_page(self):
+        first_page = KeysetPaginator(Screening.objects.all(), ('start_time', 'id'), 6).get_page(None)
+        for token in [
+            'garbage', encode_cursor(['not-a-date', 1], 'next'), encode_cursor([None, None], 'next'),
+            encode_cursor([[1], {'a': 1}], 'next'), encode_cursor(['2030-01-01T00:00:00+00:00', 'x'], 'prev'),
+        ]:
+            with self.subTest(token=token):
+                response = self.client.get(reverse('screening_list'), {'cursor': token})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(list(response.context['page_obj']), list(first_page))
+
+    def test_empty_previous_page_has_no_links_to_none(self):
+        paginator = KeysetPaginator(Screening.objects.all(), ('start_time', 'id'), 6)
+        first = paginator.get_page(None).object_list[0]
+        page = paginator.get_page(encode_cursor([first.start_time, first.id], 'prev'))
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_next())
+        self.assertFalse(page.has_previous())
+
+        response = self.client.get(reverse('screening_list'), {'cursor': encode_cursor([first.start_time, first.id], 'prev')})
+        self.assertNotContains(response, 'cursor=None')
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _movie_with_poster(self, width):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width * 3 // 2), 'navy').save(buffer, 'PNG')
+        movie = Movie.objects.create(title='Постер', description='', duration=90)
+        movie.poster.save(f'poster_{width}.png', ContentFile(buffer.getvalue()))
+        return movie
+
+    def test_widths_for_large_poster(self):
+        movie = self._movie_with_poster(1000)
+        self.assertEqual(generate_thumbs(movie.pk), [160, 320, 480])
+        movie.refresh_from_db()
+        self.assertEqual(movie.poster_thumbs, [160, 320, 480])
+        for extension, _, _ in THUMB_FORMATS:
+            self.assertTrue(default_storage.exists(thumb_name(movie.poster.name, 480, extension)))
+
+    def test_small_poster_is_not_upscaled(self):
+        movie = self._movie_with_poster(200)
+        self.assertEqual(generate_thumbs(movie.pk), [160, 200])
+
+
+class DemoPostersTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.poster_path = os.path.join(media_root.name, load_demo_data.poster_name('Фильм'))
+        self.output = self.enterContext(contextlib.redirect_stdout(StringIO()))
+
+    def test_downloaded_poster_is_not_fetched_again(self):
+        source = mock.Mock(**{'fetch.return_value': b'poster'})
+        self.assertEqual(load_demo_data.download_poster('Фильм', source), load_demo_data.poster_name('Фильм'))
+        self.assertEqual(load_demo_data.download_poster('Фильм', source), load_demo_data.poster_name('Фильм'))
+        source.fetch.assert_called_once_with('Фильм')
+
+    def test_interrupted_download_is_retried(self):
+        os.makedirs(os.path.dirname(self.poster_path))
+        with open(os.path.splitext(self.poster_path)[0] + '.part', 'wb') as partial:
+            partial.write(b'half')
+        source = mock.Mock(**{'fetch.return_value': b'poster'})
+
+        load_demo_data.download_poster('Фильм', source)
+        with open(self.poster_path, 'rb') as poster:
+            self.assertEqual(poster.read(), b'poster')
+
+    def test_failed_download_leaves_no_file(self):
+        source = mock.Mock(**{'fetch.side_effect': OSError('нет сети')})
+        self.assertIsNone(load_demo_data.download_poster('Фильм', source))
+        self.assertFalse(os.path.exists(self.poster_path))
+
+    def test_posters_are_fetched_in_parallel(self):
+        # Первая загрузка ждёт вторую: при последовательной работе барьер не дождётся
+        barrier = threading.Barrier(2, timeout=5)
+        titles = []
+
+        class Source:
+            def fetch(self, movie_title):
+                titles.append(movie_title)
+                if len(titles) <= 2:
+                    barrier.wait()
+                return movie_title.encode()
+
+        load_demo_data.create_demo_data(Source(), workers=2)
+        self.assertFalse(Movie.objects.filter(poster='').exists())
+
+
+class GenerateDatasetTests(TestCase):
+    OPTIONS = {'movies': 4, 'halls': 3, 'days': 2, 'slots': 8, 'users': 5, 'occupancy': 0.4, 'batch_size': 50}
+
+    def setUp(self):
+        clear_caches()
+
+    def generate(self, **options):
+        call_command('generate_dataset', **{**self.OPTIONS, **options}, stdout=StringIO())
+
+    def assert_no_overlaps(self):
+        by_hall = {}
+        for hall_id, start_time, end_time in Screening.objects.values_list('hall_id', 'start_time', 'end_time'):
+            by_hall.setdefault(hall_id, []).append((start_time, end_time))
+        for hall_id, intervals in by_hall.items():
+            for index, (start, end) in enumerate(intervals):
+                for other_start, other_end in intervals[index + 1:]:
+                    self.assertFalse(start < other_end and other_start < end, f'Зал {hall_id}: сеансы пересекаются')
+
+    def test_schedule_has_no_overlaps_and_matching_counters(self):
+        self.generate(clear=True)
+        self.assertTrue(Screening.objects.exists())
+        self.assert_no_overlaps()
+        counts = Screening.objects.annotate(bookings=Count('booking')).values_list('seats_booked', 'bookings')
+        for seats_booked, bookings in counts:
+            self.assertEqual(seats_booked, bookings)
+
+    def test_rerun_without_clear_keeps_schedule_consistent(self):
+        self.generate(clear=True)
+        first_run = Screening.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.generate(seed=7)
+        self.assertGreater(Screening.objects.count(), first_run)
+        self.assert_no_overlaps()
+        self.assertTrue(RollupDirtyDay.objects.filter(date=timezone.localdate()).exists())
+
+    def test_clear_after_rollups_and_archive(self):
+        self.generate(clear=True)
+        past = create_screening(start=timezone.now() - timedelta(days=2))
+        Booking.objects.create(user=User.objects.first(), screening=past, seat=seat(past, 1, 1))
+        archive_screenings(timezone.now())
+        build_rollups(full=True)
+        self.assertTrue(ArchivedBooking.objects.exists())
+        self.assertTrue(SalesRollup.objects.exists())
+
+        self.generate(clear=True)
+        connection.check_constraints()
+        self.assertFalse(ArchivedScreening.objects.exists())
+        self.assertFalse(SalesRollup.objects.exists())
+        self.assertTrue(Screening.objects.exists())
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.user = User.objects.create_user('buyer', password='pass')
+
+    def test_day_is_marked_dirty_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertTrue(book_seats(self.user, self.screening, [(2, 1), (2, 2)]).ok)
+            self.assertFalse(RollupDirtyDay.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            list(RollupDirtyDay.objects.values_list('date', flat=True)), [timezone.localdate(self.screening.start_time)],
+        )
+
+        build_rollups()
+        totals = rollup_totals()
+        self.assertEqual(totals['screenings'], 1)
+        self.assertEqual(totals['seats_sold'], 2)
+        self.assertEqual(totals['capacity'], 40)
+        self.assertEqual(totals['revenue'], 600)
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+
+@PLAIN_STATIC
+@mock.patch('cinema_app.management.commands.benchmark_views.setup_test_environment')
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        user = User.objects.create_user('buyer', password='pass')
+        book_seats(user, self.screening, [(1, 1), (1, 2)])
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        self.addCleanup(os.unlink, output.name)
+        self.output = output.name
+
+    def benchmark(self, **options):
+        call_command('benchmark_views', iterations=2, stdout=StringIO(), **options)
+
+    def test_report_covers_pages_and_matches_itself(self, _):
+        self.benchmark(output=self.output)
+        report = benchmarks.load(self.output)
+        self.assertEqual(report['dataset'], {'screenings': 1, 'bookings': 2})
+        self.assertIn('screening_list', report['results'])
+        for name, result in report['results'].items():
+            self.assertEqual(result['status'], 200, name)
+
+        # Время на двух итерациях шумит, сверяем только запросы
+        self.benchmark(baseline=self.output, threshold=100)
+
+    def test_query_growth_fails_against_baseline(self, _):
+        self.benchmark(output=self.output)
+        report = benchmarks.load(self.output)
+        report['results']['screening_list']['queries'] -= 1
+        benchmarks.save(self.output, report)
+
+        with self.assertRaisesMessage(CommandError, 'screening_list: запросов'):
+            self.benchmark(baseline=self.output, threshold=100)
+
+    def test_compare_allows_threshold(self, _):
+        base = {'results': {'page': {'queries': 3, 'p95_ms': 10.0, 'rows': 100}}}
+        within = {'results': {'page': {'queries': 3, 'p95_ms': 11.9, 'rows': 119}}}
+        beyond = {'results': {'page': {'queries': 3, 'p95_ms': 12.5, 'rows': 121}}}
+
+        self.assertEqual(benchmarks.compare(within, base, 0.2), [])
+        self.assertEqual(len(benchmarks.compare(beyond, base, 0.2)), 2)
+
+    def test_fetched_rows_are_counted(self, _):
+        with benchmarks.count_fetched_rows() as fetched:
+            list(Seat.objects.filter(hall=self.screening.hall))
+        self.assertEqual(fetched['rows'], 40)
+
+
+@PLAIN_STATIC
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        user = User.objects.create_superuser('admin', password='pass')
+        Booking.objects.bulk_create([
+            Booking(user=user, screening=self.screening, seat=seat(self.screening, 1, number)) for number in range(1, 6)
+        ])
+        self.client.force_login(user)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+    def test_changelists_do_not_read_whole_tables(self):
+        hall, movie, user = self.screening.hall, self.screening.movie, User.objects.get(username='admin')
+        now = timezone.now()
+        for days in (2, 3, 4):
+            past = create_screening(start=now - timedelta(days=days), hall=hall, movie=movie)
+            Booking.objects.create(user=user, screening=past, seat=seat(past, 1, 1))
+            create_screening(start=now + timedelta(days=days), hall=hall, movie=movie)
+        archive_screenings(now)
+        build_rollups(full=True)
+        app_tables = {model._meta.db_table for model in apps.get_app_config('cinema_app').get_models()}
+        # Сводки витрины продаж читают её целиком по замыслу - таблица маленькая
+        for model, allowed in (
+            (Booking, ()), (Screening, ()), (Seat, ()), (ArchivedScreening, ()), (ArchivedBooking, ()),
+            (SalesRollup, (SalesRollup._meta.db_table,)),
+        ):
+            url = reverse(f'admin:cinema_app_{model._meta.model_name}_changelist')
+            # Список в одну страницу Django выбирает без LIMIT - на больших таблицах страниц много
+            with mock.patch.object(LargeTableAdmin, 'list_per_page', 2), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            with connection.cursor() as cursor:
+                for query in queries.captured_queries:
+                    # Постраничная выборка и ограниченный подсчёт останавливаются на LIMIT
+                    if not query['sql'].startswith('SELECT') or ' LIMIT ' in query['sql']:
+                        continue
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    for row in cursor.fetchall():
+                        scan = FULL_SCAN.match(row[-1])
+                        with self.subTest(model=model.__name__, sql=query['sql']):
+                            self.assertFalse(
+                                scan and scan[1] in app_tables and scan[1] not in allowed,
+                                f'Полное чтение таблицы: {row[-1]}',
+                            )
+
+    def test_pages_past_count_limit_open(self):
+        url = reverse('admin:cinema_app_seat_changelist')
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 10), mock.patch.object(SeatAdmin, 'list_per_page', 5):
+            response = self.client.get(url, {'hall__id__exact': self.screening.hall_id, 'p': 5})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                list(response.context['cl'].result_list),
+                list(Seat.objects.filter(hall=self.screening.hall).order_by('-pk')[20:25]),
+            )
+            self.assertEqual(self.client.get(url, {'hall__id__exact': self.screening.hall_id, 'p': 2}).status_code, 200)
+
+
+@PLAIN_STATIC
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.url = reverse('screening_list')
+        # Соединение теста открыто раньше middleware, а асинхронный клиент
+        # поднимает его в другом потоке - connection_created уже не придёт
+        _install_wrapper(connection)
+
+    def profiling(self, **options):
+        return override_settings(PROFILING={'ENABLED': True, 'SLOW_REQUEST_MS': 10_000, **options})
+
+    def timings(self, response):
+        return dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+
+    def test_disabled_profiler_adds_nothing(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+
+    def test_server_timing_counts_queries(self):
+        with self.profiling(), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'sql', 'tpl', 'view', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timings['sql'])
+        self.assertNotEqual(timings['tpl'], 'dur=0.0')
+
+    async def test_async_stack_is_profiled(self):
+        with self.profiling():
+            response = await self.async_client.get(self.url)
+        self.assertRegex(response['Server-Timing'], r'sql;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_slow_request_is_logged_with_queries(self):
+        with self.profiling(SLOW_REQUEST_MS=0), self.assertLogs('cinema_app.profiling', 'WARNING') as logs:
+            self.client.get(self.url)
+        self.assertIn(f'Медленный запрос GET {self.url}', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_sampled_histograms_are_dumped(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'profile.json')
+        with self.profiling(SAMPLE_RATE=1, DUMP_INTERVAL=0, DUMP_PATH=path):
+            self.client.get(self.url)
+        with open(path, encoding='utf-8') as file:
+            views = json.load(file)['views']
+        self.assertEqual(views['screening_list']['count'], 1)
+
+
+class DatabaseSetupTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'PRAGMA есть только в SQLite')
+    def test_sqlite_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_replica_router(self):
+        router = ReplicaRouter()
+
+        @read_from_replica
+        def view(request):
+            return router.db_for_read(Movie), router.db_for_read(User), router.db_for_write(Movie)
+
+        self.assertEqual(view(None), (REPLICA_ALIAS, None, 'default'))
+        self.assertIsNone(router.db_for_read(Movie))
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'cinema_app'))
+
+
+@PLAIN_STATIC
+class BestSeatsViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.client.force_login(User.objects.create_user('buyer', password='pass'))
+        self.url = reverse('seat_selection', args=[self.screening.id])
+
+    def messages_after(self, count):
+        response = self.client.post(self.url, {'action': 'best', 'count': count})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        return [message.message for message in get_messages(response.wsgi_request)]
+
+    def test_conflicts_say_seats_were_taken(self):
+        taken = BookingResult(conflicts={(3, 4): CONFLICT_BOOKED})
+        with mock.patch('cinema_app.services.book_seats', return_value=taken) as book:
+            self.assertEqual(self.messages_after(2), ['Места только что заняли другие покупатели, попробуйте ещё раз.'])
+        self.assertEqual(book.call_count, 3)
+
+    def test_page_has_no_inline_handlers(self):
+        content = self.client.get(self.url).content.decode()
+        self.assertIn('id="best_show"', content)
+        self.assertNotRegex(content, r'\son[a-z]+=')
+
+    def test_no_room_in_a_row(self):
+        self.assertEqual(self.messages_after(9), ['Не хватает свободных мест подряд в одном ряду: нужно 9.'])
+
+
+@PLAIN_STATIC
+class MovieSearchTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.in_description = Movie.objects.create(title='Пустыня', description='Снято по мотивам «Дюны».', duration=120)
+        self.in_title = Movie.objects.create(title='Дюна', description='Фантастика.', duration=155)
+        Movie.objects.create(title='Комедия', description='Совсем про другое.', duration=90)
+
+    def test_search_is_not_cached_and_ranked(self):
+        url = reverse('movie_list')
+        for _ in range(2):
+            response = self.client.get(url, {'q': 'дюна'})
+            self.assertNotIn('X-Page-Cache', response)
+            self.assertEqual(list(response.context['movies']), [self.in_title, self.in_description])
+
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+
+@PLAIN_STATIC
+@override_settings(ADMISSION={'ENABLED': True, 'RATE': 0.001, 'BURST': 2, 'CONCURRENCY': 8})
+class AdmissionTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.url = reverse('seat_selection', args=[self.screening.id])
+
+    def client_for(self, username):
+        client = self.client_class()
+        user = User.objects.create_user(username, password='pass')
+        client.force_login(user)
+        return client, user
+
+    def test_queue_beyond_burst(self):
+        for index in range(2):
+            client, _ = self.client_for(f'early{index}')
+            self.assertTemplateUsed(client.get(self.url), 'cinema_app/seat_selection.html')
+
+        client, _ = self.client_for('late')
+        response = client.get(self.url)
+        self.assertTemplateUsed(response, 'cinema_app/queue.html')
+        self.assertEqual(response.context['position'], 1)
+
+        with self.assertNumQueries(0):
+            status = client.get(reverse('queue_status', args=[self.screening.id])).json()
+        self.assertEqual(status['position'], 1)
+
+        stats = admission.metrics()['screenings'][self.screening.id]
+        self.assertEqual((stats['admitted'], stats['queued'], stats['queue_length']), (2, 1, 1))
+
+    def test_post_with_holds_skips_queue(self):
+        for index in range(2):
+            self.client_for(f'early{index}')[0].get(self.url)
+
+        client, user = self.client_for('holder')
+        hold_seats(self.screening.id, user.id, [(1, 1)])
+        response = client.post(self.url, {'action': 'release'})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(user_holds(self.screening.id, user.id), {})
+
+        # Без удержанных мест POST встаёт в очередь
+        response = self.client_for('no_holds')[0].post(self.url, {'action': 'release'})
+        self.assertTemplateUsed(response, 'cinema_app/queue.html')
+
+
+@PLAIN_STATIC
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.user = User.objects.create_user('buyer', password='pass')
+        self.client.force_login(self.user)
+        self.url = reverse('seat_selection', args=[self.screening.id])
+        self.data = {'action': 'confirm', FIELD_NAME: 'a1b2c3d4e5f6a7b8'}
+
+    def test_replay_returns_recorded_redirect_and_cookies(self):
+        hold_seats(self.screening.id, self.user.id, [(2, 2)])
+        first = self.client.post(self.url, self.data)
+        self.assertRedirects(first, reverse('booking_list'), fetch_redirect_response=False)
+        pass_cookie = admission.PASS_COOKIE.format(self.screening.id)
+        self.assertIn(pass_cookie, first.cookies)
+
+        with CaptureQueriesContext(connection) as queries:
+            replay = self.client.post(self.url, self.data)
+        self.assertEqual(replay['Location'], first['Location'])
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.cookies[pass_cookie].value, first.cookies[pass_cookie].value)
+        self.assertFalse([query for query in queries.captured_queries if Booking._meta.db_table in query['sql']])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_same_key_while_running_gets_conflict(self):
+        nested = []
+
+        def book_and_retry(*args, **kwargs):
+            nested.append(self.client.post(self.url, self.data))
+            return BookingResult(conflicts={(2, 2): CONFLICT_BOOKED})
+
+        hold_seats(self.screening.id, self.user.id, [(2, 2)])
+        with mock.patch('cinema_app.views.book_seats', side_effect=book_and_retry):
+            self.client.post(self.url, self.data)
+        self.assertEqual(nested[0].status_code, 409)
+        self.assertEqual(nested[0]['Retry-After'], '1')
+
+
+@PLAIN_STATIC
+class ExportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.screening = create_screening()
+        self.user = User.objects.create_user('buyer', email='buyer@example.com', password='pass')
+        book_seats(self.user, self.screening, [(2, 3), (2, 4)])
+        self.admin = User.objects.create_superuser('admin', password='pass')
+        self.url = reverse('admin:cinema_app_booking_changelist')
+        self.data = {'_selected_action': list(Booking.objects.values_list('pk', flat=True))}
+
+    def test_csv_export_streams_rows_with_bom(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, {**self.data, 'action': 'export_csv'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+
+        self.assertTrue(content.startswith('\ufeffБронирование,'))
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn(',buyer,buyer@example.com,', lines[1])
+        self.assertTrue(lines[2].endswith(',2,4,300.00'))
+
+    def test_ndjson_export_streams_one_object_per_line(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(self.url, {**self.data, 'action': 'export_ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+
+        self.assertEqual([(row['row'], row['seat']) for row in rows], [(2, 3), (2, 4)])
+        self.assertEqual(rows[0]['username'], 'buyer')
+        self.assertEqual(rows[0]['price'], '300.00')
+
+    async def test_asgi_export_is_async_iterator(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.post(self.url, {**self.data, 'action': 'export_csv'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+
+        self.assertTrue(content.startswith('\ufeff'))
+        self.assertEqual(len(content.splitlines()), 3)
+
+
+@PLAIN_STATIC
+class ArchiveTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('regular', password='pass')
+        self.old = create_screening(start=timezone.now() - timedelta(days=120))
+        self.recent = create_screening(hall=self.old.hall, movie=self.old.movie)
+        book_seats(self.user, self.old, [(1, 1), (1, 2), (1, 3)])
+        book_seats(self.user, self.recent, [(2, 1)])
+
+    def test_archive_keeps_rollups_and_counters(self):
+        build_rollups(full=True)
+        before = rollup_totals()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_screenings(default_cutoff()), (1, 3))
+        self.assertFalse(Screening.objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(ArchivedScreening.objects.get().seats_booked, 3)
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+        build_rollups(full=True)
+        self.assertEqual(rollup_totals(), before)
+        self.recent.refresh_from_db()
+        self.assertEqual(self.recent.seats_booked, 1)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('archived_bookings'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+
+    def test_archive_reads_bookings_once(self):
+        # Брони читаются только для копии в архив, удаление их не загружает
+        with CaptureQueriesContext(connection) as queries:
+            archive_screenings(default_cutoff())
+        booking_table = f'FROM "{Booking._meta.db_table}"'
+        reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and booking_table in query['sql']
+        ]
+        self.assertEqual(len(reads), 1, reads)
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        self.root = static_root.name
+        os.makedirs(os.path.join(self.root, 'css'))
+        self.path = os.path.join(self.root, 'css', 'app.css')
+        self.content = b'body { color: black; }' * 50
+        for suffix, content in (('', self.content), ('.gz', gzip.compress(self.content)), ('.br', b'')):
+            with open(self.path + suffix, 'wb') as target:
+                target.write(content)
+
+    def pick(self, accept_encoding):
+        return _pick_encoding(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding), self.path)[0]
+
+    def test_accept_encoding_qvalues(self):
+        self.assertEqual(self.pick('gzip, deflate, br'), 'br')
+        self.assertEqual(self.pick('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(self.pick('br;q=0, gzip'), 'gzip')
+        self.assertEqual(self.pick('br;Q=0.0, gzip;q=0'), None)
+        self.assertEqual(self.pick('*'), 'br')
+        self.assertEqual(self.pick('br;q=0, *'), 'gzip')
+        self.assertEqual(self.pick('*;q=0'), None)
+        self.assertEqual(self.pick('identity'), None)
+        self.assertEqual(self.pick(''), None)
+
+    def test_serve_picks_gzip(self):
+        with override_settings(STATIC_ROOT=self.root):
+            response = serve_static(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br;q=0'), 'css/app.css')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.content)
+
+            response = serve_static(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip;q=0'), 'css/app.css')
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+
+    def test_vendor_tag_falls_back_to_cdn(self):
+        path, url, integrity = VENDOR_ASSETS['bootstrap_css']
+        is_vendored.cache_clear()
+        self.addCleanup(is_vendored.cache_clear)
+        with override_settings(STATICFILES_DIRS=[self.root]):
+            self.assertIn(f'href="{url}"', vendor_css('bootstrap_css'))
+            self.assertIn(f'integrity="{integrity}"', vendor_css('bootstrap_css'))
+
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)))
+            open(os.path.join(self.root, path), 'w').close()
+            is_vendored.cache_clear()
+            with PLAIN_STATIC:
+                self.assertEqual(vendor_css('bootstrap_css'), f'<link href="/static/{path}" rel="stylesheet">')
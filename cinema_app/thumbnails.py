@@ -0,0 +1,90 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+
+from .models import Movie
+from .pagecache import MOVIES, invalidate
+
+logger = logging.getLogger(__name__)
+
+THUMB_WIDTHS = (160, 320, 480)
+THUMB_FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 6}), ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+
+_executor = None
+
+
+def thumb_name(poster_name, width, extension):
+    directory, filename = posixpath.split(poster_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'thumbs', f'{stem}_{width}.{extension}')
+
+
+def thumb_url(poster_name, width, extension):
+    return default_storage.url(thumb_name(poster_name, width, extension))
+
+
+def delete_thumbs(poster_name, widths):
+    for width in widths:
+        for extension, _, _ in THUMB_FORMATS:
+            default_storage.delete(thumb_name(poster_name, width, extension))
+
+
+def generate_thumbs(movie_id):
+    movie = Movie.objects.filter(pk=movie_id).first()
+    if movie is None or not movie.poster:
+        return []
+
+    poster_name = movie.poster.name
+    with default_storage.open(poster_name, 'rb') as poster:
+        image = Image.open(poster)
+        image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Маленькие постеры не увеличиваем: самая крупная копия - в исходную ширину
+    widths = sorted({width for width in THUMB_WIDTHS if width < image.width} | {min(image.width, THUMB_WIDTHS[-1])})
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, image_format, options in THUMB_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = thumb_name(poster_name, width, extension)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    # Постер могли заменить, пока мы работали
+    if Movie.objects.filter(pk=movie_id, poster=poster_name).update(poster_thumbs=widths):
+        invalidate(MOVIES)
+    return widths
+
+
+def _generate_in_worker(movie_id):
+    try:
+        generate_thumbs(movie_id)
+    except Exception:
+        logger.exception('Не удалось создать уменьшенные копии постера фильма %s', movie_id)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = getattr(settings, 'POSTER_THUMBNAIL_WORKERS', 2)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='poster-thumbs')
+    return _executor
+
+
+def schedule_thumbs(movie_id):
+    if getattr(settings, 'POSTER_THUMBNAIL_WORKERS', 2):
+        transaction.on_commit(lambda: _get_executor().submit(_generate_in_worker, movie_id))
+    else:
+        transaction.on_commit(lambda: generate_thumbs(movie_id))
@@ -4,10 +4,18 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('movies/', views.movie_list, name='movie_list'),
+    path('movies/autocomplete/', views.movie_autocomplete, name='movie_autocomplete'),
     path('screenings/', views.screening_list, name='screening_list'),
     path('screenings/<int:movie_id>/', views.screening_list, name='screening_list_by_movie'),
     path('screening/<int:screening_id>/seats/', views.seat_selection, name='seat_selection'),
+    path('screening/<int:screening_id>/queue/', views.queue_status, name='queue_status'),
+    path('screening/<int:screening_id>/availability/', views.seat_availability, name='seat_availability'),
+    path('screening/<int:screening_id>/best-seats/', views.best_seats, name='best_seats'),
+    path('screening/<int:screening_id>/availability/stream/', views.seat_availability_stream, name='seat_availability_stream'),
     path('bookings/', views.booking_list, name='booking_list'),
+    path('bookings/archive/', views.archived_bookings, name='archived_bookings'),
     path('bookings/<int:booking_id>/cancel/', views.cancel_booking, name='cancel_booking'),
     path('register/', views.register, name='register'),
+    path('cache-stats/', views.page_cache_status, name='page_cache_status'),
+    path('admission-stats/', views.admission_metrics, name='admission_metrics'),
 ]
\ No newline at end of file
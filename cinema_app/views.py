@@ -1,116 +1,254 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.db.models import Q
+from django.urls import reverse
 from django.utils import timezone
-from django.core.paginator import Paginator
-from .models import Movie, Screening, CinemaHall, Seat, Booking
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from core.db_routers import read_from_replica
+from .models import ArchivedBooking, Movie, Screening, CinemaHall, Booking
 from .forms import BookingForm
+from .admission import admission_control, grant_pass, metrics as admission_metrics_data, position, read_ticket, wait_seconds
+from .availability import asnapshot, current_etag, payload, snapshot_event, stream_events
+from .pagecache import MOVIES, SCREENINGS, cache_public_page, movie_screenings, stats as page_cache_stats
+from .pagination import KeysetPaginator
+from .idempotency import idempotent
+from .holds import get_holds, hold_seats, hold_seconds, release_seats, user_holds
+from .seatmap import get_seatmap, parse_seat_key
+from .search import autocomplete, search_movies
+from .seatfinder import find_best_seats, seats_held_by_others
+from .services import MAX_SEATS_PER_BOOKING, book_best_seats, book_seats
 
-def home(request):
-    today = timezone.now().date()
-    screenings = Screening.objects.filter(
-        start_time__date=today, 
-        start_time__gte=timezone.now()
-    ).select_related('movie', 'hall')
-    return render(request, 'cinema_app/home.html', {
+async def _prefetch_user(request):
+    # Шаблоны читают request.user синхронно: в асинхронном представлении
+    # пользователя нужно загрузить заранее, иначе ORM вызовется из цикла событий
+    request.user = await request.auser()
+
+@read_from_replica
+@cache_public_page(lambda: [MOVIES, SCREENINGS])
+async def home(request):
+    await _prefetch_user(request)
+    now = timezone.now()
+    today = timezone.localdate(now)
+    # Диапазон вместо start_time__date, чтобы работал индекс по start_time
+    tomorrow = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+    screenings = [screening async for screening in Screening.objects.filter(
+        start_time__gte=now,
+        start_time__lt=tomorrow
+    ).not_sold_out().select_related('movie', 'hall').order_by('start_time')]
+    response = render(request, 'cinema_app/home.html', {
         'screenings': screenings,
         'today': today
     })
+    response.cache_until = screenings[0].start_time if screenings else tomorrow
+    return response
+
+@read_from_replica
+@cache_public_page(lambda: [MOVIES], bypass=lambda request: 'q' in request.GET)
+async def movie_list(request):
+    await _prefetch_user(request)
+    query = request.GET.get('q', '').strip()
+    if query:
+        movies = await sync_to_async(lambda: list(search_movies(query)))()
+    else:
+        movies = [movie async for movie in Movie.objects.all()]
+    return render(request, 'cinema_app/movie_list.html', {'movies': movies, 'query': query})
 
-def movie_list(request):
-    movies = Movie.objects.all()
-    return render(request, 'cinema_app/movie_list.html', {'movies': movies})
+@require_GET
+@cache_control(max_age=60)
+async def movie_autocomplete(request):
+    suggestions = await sync_to_async(autocomplete)(request.GET.get('q', ''))
+    return JsonResponse({'results': [
+        {'id': movie_id, 'title': title, 'url': reverse('screening_list_by_movie', args=[movie_id])}
+        for movie_id, title in suggestions
+    ]})
 
-def screening_list(request, movie_id=None):
+@read_from_replica
+@cache_public_page(lambda movie_id=None: [MOVIES, movie_screenings(movie_id) if movie_id else SCREENINGS])
+async def screening_list(request, movie_id=None):
+    await _prefetch_user(request)
     screenings = Screening.objects.filter(start_time__gte=timezone.now())
     
     if movie_id:
         screenings = screenings.filter(movie_id=movie_id)
     
-    screenings = screenings.select_related('movie', 'hall').order_by('start_time')
+    screenings = screenings.not_sold_out().select_related('movie', 'hall')
     
-    paginator = Paginator(screenings, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(screenings, ('start_time', 'id'), 6)
+    page_obj = await paginator.aget_page(request.GET.get('cursor'))
     
-    return render(request, 'cinema_app/screening_list.html', {
+    response = render(request, 'cinema_app/screening_list.html', {
         'screenings': page_obj,
         'page_obj': page_obj
     })
+    if page_obj:
+        response.cache_until = page_obj.object_list[0].start_time
+    return response
 
 @login_required
+@idempotent
+@admission_control
 def seat_selection(request, screening_id):
-    screening = get_object_or_404(Screening, id=screening_id)
+    screening = get_object_or_404(Screening.objects.select_related('movie', 'hall'), id=screening_id)
     hall = screening.hall
     
     if screening.start_time <= timezone.now():
         messages.error(request, 'Этот сеанс уже начался или завершился!')
         return redirect('screening_list')
     
-    booked_seats = Booking.objects.filter(screening=screening).values_list('seat_id', flat=True)
-    
-    seats = Seat.objects.filter(hall=hall).order_by('row', 'number')
-    
-    seats_matrix = []
-    current_row = None
-    row_seats = []
-    
-    for seat in seats:
-        if seat.row != current_row:
-            if current_row is not None:
-                seats_matrix.append(row_seats)
-            current_row = seat.row
-            row_seats = []
-        
-        is_booked = seat.id in booked_seats
-        row_seats.append({
-            'seat': seat,
-            'is_booked': is_booked
-        })
-    
-    if row_seats:
-        seats_matrix.append(row_seats)
-    
     if request.method == 'POST':
-        seat_id = request.POST.get('seat_id')
-        if seat_id:
-            try:
-                seat = Seat.objects.get(id=seat_id, hall=hall)
-                
-                if Booking.objects.filter(screening=screening, seat=seat).exists():
-                    messages.error(request, 'Это место уже забронировано!')
-                    return redirect('seat_selection', screening_id=screening_id)
-                
-                Booking.objects.create(
-                    user=request.user,
-                    screening=screening,
-                    seat=seat
-                )
-                messages.success(request, f'Место {seat} успешно забронировано!')
+        action = request.POST.get('action', 'hold')
+        my_holds = user_holds(screening.id, request.user.id)
+        
+        if action == 'release':
+            release_seats(screening.id, request.user.id, list(my_holds))
+            messages.info(request, 'Удержание мест снято.')
+            return redirect('seat_selection', screening_id=screening_id)
+        
+        if action == 'confirm':
+            if not my_holds:
+                messages.error(request, 'Время удержания мест истекло, выберите места заново.')
+                return redirect('seat_selection', screening_id=screening_id)
+            
+            result = book_seats(request.user, screening, sorted(my_holds))
+            if result.ok:
+                booked = ', '.join(str(booking.seat) for booking in result.bookings)
+                messages.success(request, f'Места успешно забронированы: {booked}!')
                 return redirect('booking_list')
-                
-            except Seat.DoesNotExist:
-                messages.error(request, 'Выбранное место не существует!')
+            
+            for message in result.conflict_messages():
+                messages.error(request, message)
+            return redirect('seat_selection', screening_id=screening_id)
+        
+        if action == 'best':
+            try:
+                count = int(request.POST.get('count', ''))
+            except ValueError:
+                count = 0
+            if not 1 <= count <= MAX_SEATS_PER_BOOKING:
+                messages.error(request, f'Укажите от 1 до {MAX_SEATS_PER_BOOKING} мест.')
                 return redirect('seat_selection', screening_id=screening_id)
+            
+            result = book_best_seats(request.user, screening, count)
+            if result.ok:
+                booked = ', '.join(str(booking.seat) for booking in result.bookings)
+                messages.success(request, f'Места успешно забронированы: {booked}!')
+                return redirect('booking_list')
+            if result.conflicts:
+                messages.error(request, 'Места только что заняли другие покупатели, попробуйте ещё раз.')
+            else:
+                messages.error(request, f'Не хватает свободных мест подряд в одном ряду: нужно {count}.')
+            return redirect('seat_selection', screening_id=screening_id)
+        
+        seat_keys = [key for key in map(parse_seat_key, request.POST.getlist('seat')) if key]
+        if len(set(seat_keys) | set(my_holds)) > MAX_SEATS_PER_BOOKING:
+            messages.error(request, f'За один раз можно забронировать не более {MAX_SEATS_PER_BOOKING} мест!')
+            return redirect('seat_selection', screening_id=screening_id)
+        
+        if seat_keys:
+            seatmap = get_seatmap(screening)
+            if any(not seatmap.contains(*key) or seatmap.is_booked(*key) for key in seat_keys):
+                messages.error(request, 'Некоторые из выбранных мест уже заняты!')
+            elif hold_seats(screening.id, request.user.id, seat_keys):
+                messages.error(request, 'Некоторые из выбранных мест только что выбрал другой покупатель!')
+            else:
+                minutes = hold_seconds() // 60
+                messages.info(request, f'Места удерживаются за вами {minutes} мин. Подтвердите бронирование.')
+            return redirect('seat_selection', screening_id=screening_id)
+    
+    seatmap = get_seatmap(screening)
+    holds = get_holds(screening.id)
+    my_holds = {key: expires for key, (owner, expires) in holds.items() if owner == request.user.id}
     
     return render(request, 'cinema_app/seat_selection.html', {
         'screening': screening,
         'hall': hall,
-        'seats_matrix': seats_matrix
+        'seats_matrix': seatmap.matrix(held=holds, selected=my_holds),
+        'my_holds': sorted(my_holds),
+        'hold_expires': datetime.fromtimestamp(min(my_holds.values()), tz=dt_timezone.utc) if my_holds else None,
+        'max_seats': MAX_SEATS_PER_BOOKING,
+        'best_counts': range(1, min(MAX_SEATS_PER_BOOKING, hall.seats_per_row) + 1)
     })
 
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=lambda request, screening_id: current_etag(screening_id))
+async def seat_availability(request, screening_id):
+    screening = await aget_object_or_404(Screening.objects.select_related('hall'), id=screening_id)
+    version, seatmap, holds = await asnapshot(screening)
+    return JsonResponse(payload(screening, version, seatmap, holds))
+
+@require_GET
+async def best_seats(request, screening_id):
+    screening = await aget_object_or_404(Screening.objects.select_related('hall'), id=screening_id)
+    try:
+        count = int(request.GET.get('count', ''))
+    except ValueError:
+        count = 0
+    if not 1 <= count <= MAX_SEATS_PER_BOOKING:
+        return JsonResponse({'error': f'count должен быть от 1 до {MAX_SEATS_PER_BOOKING}'}, status=400)
+    
+    user = await request.auser()
+    _, seatmap, holds = await asnapshot(screening)
+    seats = find_best_seats(seatmap, count, seats_held_by_others(holds, user.id))
+    return JsonResponse({'screening': screening.id, 'count': count, 'seats': seats})
+
+@require_GET
+async def seat_availability_stream(request, screening_id):
+    screening = await aget_object_or_404(Screening.objects.select_related('hall'), id=screening_id)
+    
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(stream_events(screening), content_type='text/event-stream')
+    else:
+        # Под WSGI бесконечный поток занял бы рабочий процесс целиком:
+        # отдаём снимок, и EventSource переподключается с интервалом retry
+        content = await sync_to_async(snapshot_event)(screening)
+        response = HttpResponse(content, content_type='text/event-stream')
+    
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@require_GET
+@cache_control(no_store=True)
+def queue_status(request, screening_id):
+    # Опрос очереди: только подписанная кука и счётчики в кэше, без сессии и БД
+    user_id, ticket = read_ticket(request, screening_id)
+    if ticket is None:
+        return JsonResponse({'queued': False})
+    
+    places = position(screening_id, ticket)
+    if places:
+        return JsonResponse({'queued': True, 'position': places, 'wait_seconds': wait_seconds(places)})
+    
+    response = JsonResponse({'queued': False, 'url': reverse('seat_selection', args=[screening_id])})
+    grant_pass(response, screening_id, user_id)
+    return response
+
+@staff_member_required
+def page_cache_status(request):
+    return JsonResponse(page_cache_stats())
+
+@staff_member_required
+def admission_metrics(request):
+    return JsonResponse(admission_metrics_data())
+
 @login_required
 def booking_list(request):
     bookings = Booking.objects.filter(
         user=request.user
-    ).select_related('screening', 'seat', 'screening__movie', 'screening__hall').order_by('-booked_at')
+    ).select_related('screening', 'seat', 'screening__movie', 'screening__hall')
     
-    paginator = Paginator(bookings, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(bookings, ('-booked_at', '-id'), 10)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'cinema_app/booking_list.html', {
         'bookings': page_obj,
@@ -118,6 +256,19 @@ def booking_list(request):
     })
 
 @login_required
+def archived_bookings(request):
+    # Подгружается на странице броней по запросу: архив не трогается при обычном просмотре
+    bookings = ArchivedBooking.objects.filter(user=request.user).select_related('screening__movie', 'screening__hall')
+    paginator = KeysetPaginator(bookings, ('-booked_at', '-id'), 20)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    
+    return render(request, 'cinema_app/archived_bookings.html', {
+        'bookings': page_obj,
+        'page_obj': page_obj
+    })
+
+@login_required
+@idempotent
 def cancel_booking(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id, user=request.user)
     
@@ -1,3 +1,7 @@
+# Потоковые обновления мест (SSE) работают только под ASGI-сервером,
+# например: uvicorn core.asgi:application
+# Главная, афиша, расписание и доступность мест - асинхронные представления:
+# под ASGI они не занимают поток на время запроса.
 import os
 
 from django.core.asgi import get_asgi_application
@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+REPLICA_ALIAS = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    # На реплику уходят только чтения данных кинотеатра внутри представлений,
+    # помеченных read_from_replica; сессии, пользователи и всё остальное,
+    # включая чтения перед записью, остаются на основной базе
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label == 'cinema_app':
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+def read_from_replica(view):
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _use_replica.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    # Внутри блока чтения снова идут на основную базу, даже в представлении
+    # с read_from_replica
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
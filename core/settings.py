@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,6 +18,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cinema_app.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,17 +41,68 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cinema_app.context_processors.page_cache',
             ],
         },
     },
 ]
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Профиль базы данных выбирается переменной окружения CINEMA_DB_PROFILE:
+# sqlite (по умолчанию, для разработки и одного сервера) или postgres.
+DB_PROFILE = os.environ.get('CINEMA_DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('CINEMA_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            # Тестовая база - файл, а не память: тестам с потоками нужны
+            # отдельные соединения с одной базой
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+            'OPTIONS': {
+                # WAL: читатели не блокируют писателя; IMMEDIATE берёт блокировку записи
+                # в начале транзакции, а не при первом INSERT, и ждёт её busy_timeout мс
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=5000;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
+elif DB_PROFILE == 'postgres':
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('CINEMA_DB_NAME', 'cinema'),
+        'USER': os.environ.get('CINEMA_DB_USER', 'cinema'),
+        'PASSWORD': os.environ.get('CINEMA_DB_PASSWORD', ''),
+        'HOST': os.environ.get('CINEMA_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('CINEMA_DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Пул psycopg 3; с пулом CONN_MAX_AGE должен оставаться 0
+            'pool': {
+                'min_size': int(os.environ.get('CINEMA_DB_POOL_MIN', '2')),
+                'max_size': int(os.environ.get('CINEMA_DB_POOL_MAX', '10')),
+                'timeout': 10,
+            },
+        },
+    }
+    DATABASES = {'default': _postgres}
+    if os.environ.get('CINEMA_DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **_postgres,
+            'HOST': os.environ['CINEMA_DB_REPLICA_HOST'],
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+else:
+    raise ValueError(f'Неизвестный CINEMA_DB_PROFILE: {DB_PROFILE}')
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -65,6 +118,16 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic добавляет к именам хэш содержимого и готовит сжатые копии.
+# Без отдельного веб-сервера статику раздаёт core.staticfiles.serve
+# (CINEMA_SERVE_STATIC=1) с Cache-Control на год для имён с хэшем
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+SERVE_STATIC = os.environ.get('CINEMA_SERVE_STATIC') == '1'
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -73,4 +136,62 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
-LOGIN_URL = 'login'
\ No newline at end of file
+LOGIN_URL = 'login'
+
+# Удержания мест и карты занятости хранятся в кэше. При нескольких процессах
+# сервера нужен общий бэкенд (Redis/Memcached), locmem подходит для разработки.
+# Холды мест живут в отдельном кэше без вытеснения: при заполнении общего
+# кэша locmem выбрасывает треть ключей, и вместе со страницами пропадали бы
+# живые холды. locmem у каждого процесса свой, поэтому в продакшене с
+# несколькими воркерами оба кэша должны смотреть в общий Redis/Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cinema',
+    },
+    'holds': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cinema-holds',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10_000_000},
+    },
+}
+
+SEAT_HOLD_SECONDS = 5 * 60
+
+# Очередь на бронирование при открытии продаж: на каждый сеанс пропускается
+# RATE новых покупателей в секунду (BURST - сразу при пустой очереди) и не
+# больше CONCURRENCY одновременных запросов, остальные ждут в очереди
+ADMISSION = {
+    'ENABLED': os.environ.get('CINEMA_ADMISSION', '1') == '1',
+    'RATE': float(os.environ.get('CINEMA_ADMISSION_RATE', '2')),
+    'BURST': int(os.environ.get('CINEMA_ADMISSION_BURST', '30')),
+    'CONCURRENCY': int(os.environ.get('CINEMA_ADMISSION_CONCURRENCY', '8')),
+    'PASS_SECONDS': 10 * 60,
+    'POLL_SECONDS': 3,
+}
+
+# Сколько помнить результат POST с ключом идемпотентности (повторная отправка формы)
+IDEMPOTENCY_KEY_SECONDS = 15 * 60
+
+# Сеансы старше стольких дней команда archive_screenings переносит в архив
+ARCHIVE_AFTER_DAYS = 90
+
+# Перерыв на уборку зала после сеанса: end_time = начало + длительность + перерыв
+SCREENING_CLEANING_MINUTES = 25
+
+# Уменьшенные копии постеров создаются в фоновом пуле потоков;
+# 0 - создавать сразу после сохранения фильма
+POSTER_THUMBNAIL_WORKERS = 2
+
+# Профилирование запросов: заголовок Server-Timing, журнал медленных запросов
+# и выборочные гистограммы по представлениям. Выключенный middleware не
+# добавляет накладных расходов - Django исключает его из цепочки.
+PROFILING = {
+    'ENABLED': os.environ.get('CINEMA_PROFILING') == '1',
+    'SLOW_REQUEST_MS': 500,
+    'SLOWEST_QUERIES': 5,
+    'SAMPLE_RATE': float(os.environ.get('CINEMA_PROFILING_SAMPLE_RATE', '0')),
+    'DUMP_INTERVAL': 60,
+    'DUMP_PATH': BASE_DIR / 'profiling-{pid}.json',
+}
@@ -0,0 +1,128 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.html', '.xml')
+MIN_COMPRESS_SIZE = 512
+
+# Имя с хэшем содержимого никогда не меняется - кэшируем на год;
+# файлы без хэша (например, по старым ссылкам) - ненадолго
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHORT_CACHE_CONTROL = 'public, max-age=300'
+
+# Порядок предпочтения сжатых копий
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compressed_variants(content):
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # collectstatic кладёт рядом с каждым текстовым файлом .gz (и .br, если
+    # установлен brotli), чтобы сервер не сжимал их на каждый запрос
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name, hashed_name in self.hashed_files.items():
+                self._compress(name)
+                self._compress(hashed_name)
+
+    def _compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compressed in _compressed_variants(content).items():
+            if len(compressed) < len(content):
+                with open(self.path(name + suffix), 'wb') as target:
+                    target.write(compressed)
+
+
+@lru_cache(maxsize=None)
+def _hashed_names():
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def _accepted_encodings(header):
+    # "br;q=0.8, gzip, *;q=0" -> {'br': 0.8, 'gzip': 1.0, '*': 0.0}
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def _pick_encoding(request, path):
+    # q=0 - кодировка запрещена; * задаёт вес всем не названным явно.
+    # При равном весе - порядок ENCODINGS
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    candidates = []
+    for preference, (encoding, suffix) in enumerate(ENCODINGS):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0 and os.path.isfile(path + suffix):
+            candidates.append((-quality, preference, encoding, path + suffix))
+    if not candidates:
+        return None, path
+    _, _, encoding, filepath = min(candidates)
+    return encoding, filepath
+
+
+def serve(request, path):
+    # Раздача собранной статики без отдельного веб-сервера: готовые сжатые
+    # копии и долгий Cache-Control для имён с хэшем
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    encoding, filepath = _pick_encoding(request, fullpath)
+    content_type, _ = mimetypes.guess_type(name)
+    response = FileResponse(
+        open(filepath, 'rb'), content_type=content_type or 'application/octet-stream',
+        filename=posixpath.basename(name),
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in _hashed_names() else SHORT_CACHE_CONTROL
+    return response
@@ -10,7 +10,13 @@ urlpatterns = [
 ]
 from django.conf import settings
 from django.conf.urls.static import static
+from django.urls import re_path
+
+from .staticfiles import serve as serve_static
 
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+if settings.SERVE_STATIC:
+    urlpatterns += [re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.*)$', serve_static)]
\ No newline at end of file
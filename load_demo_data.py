@@ -1,55 +1,94 @@
 import os
+import argparse
 import django
 import requests
 from django.utils import timezone
 from datetime import timedelta
 from pathlib import Path
-import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import random
+import zlib
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
+from django.conf import settings
 from cinema_app.models import Movie, CinemaHall, Screening, Seat, Booking
-from django.core.files import File
+from cinema_app.schedule import import_schedule, propose
+from cinema_app.search import rebuild_index
 
-def download_poster(movie_title, movie_id):
-    try:
-        safe_title = "".join(c if c.isalnum() else "_" for c in movie_title[:50])
-        filename = f"{movie_id}_{safe_title}.jpg"
-        
-        media_root = Path('media/posters/')
-        media_root.mkdir(parents=True, exist_ok=True)
-        filepath = media_root / filename
-        
-        seed_value = hash(movie_title) % 1000
+POSTERS_DIR = 'posters/demo'
+
+FALLBACK_URLS = [
+    "https://images.unsplash.com/photo-1536440136628-849c177e76a1?w=300&h=450&fit=crop",
+    "https://images.unsplash.com/photo-1489599809516-9827b6d1cf13?w=300&h=450&fit=crop",
+    "https://images.unsplash.com/photo-1517604931442-7e0c8ed2963c?w=300&h=450&fit=crop",
+    "https://images.unsplash.com/photo-1574267432553-4b4628081c31?w=300&h=450&fit=crop",
+]
+
+
+class HttpPosterSource:
+    def __init__(self, workers):
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch(self, movie_title):
+        seed_value = zlib.crc32(movie_title.encode()) % 1000
         image_url = f"https://picsum.photos/seed/{seed_value}/300/450"
-        
-        fallback_urls = [
-            "https://images.unsplash.com/photo-1536440136628-849c177e76a1?w=300&h=450&fit=crop",
-            "https://images.unsplash.com/photo-1489599809516-9827b6d1cf13?w=300&h=450&fit=crop",
-            "https://images.unsplash.com/photo-1517604931442-7e0c8ed2963c?w=300&h=450&fit=crop",
-            "https://images.unsplash.com/photo-1574267432553-4b4628081c31?w=300&h=450&fit=crop",
-        ]
-        
         try:
-            response = requests.get(image_url, timeout=5)
+            response = self.session.get(image_url, timeout=5)
             response.raise_for_status()
-        except:
-            fallback_url = random.choice(fallback_urls)
-            response = requests.get(fallback_url, timeout=5)
+        except requests.RequestException:
+            response = self.session.get(random.choice(FALLBACK_URLS), timeout=5)
             response.raise_for_status()
-        
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+        return response.content
+
+
+class LocalPosterSource:
+    def __init__(self, directory):
+        self.files = sorted(
+            path for path in Path(directory).iterdir()
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp')
+        )
+        if not self.files:
+            raise ValueError(f'В каталоге {directory} нет изображений')
+
+    def fetch(self, movie_title):
+        return self.files[zlib.crc32(movie_title.encode()) % len(self.files)].read_bytes()
+
+
+def poster_name(movie_title):
+    safe_title = "".join(c if c.isalnum() else "_" for c in movie_title[:50])
+    return f"{POSTERS_DIR}/{safe_title}.jpg"
+
+
+def download_poster(movie_title, source):
+    name = poster_name(movie_title)
+    filepath = Path(settings.MEDIA_ROOT) / name
+    if filepath.exists():
+        print(f"    ↺ Постер для '{movie_title}' уже загружен")
+        return name
+
+    try:
+        content = source.fetch(movie_title)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл, чтобы прерванная загрузка не считалась готовой
+        partial = filepath.with_suffix('.part')
+        partial.write_bytes(content)
+        partial.replace(filepath)
         
         print(f"    ✓ Загружено изображение для '{movie_title}'")
-        return filepath
+        return name
     except Exception as e:
         print(f"    ✗ Не удалось загрузить изображение для '{movie_title}': {str(e)[:100]}")
         return None
 
-def create_demo_data():
+def create_demo_data(poster_source=None, workers=8):
     print("Очистка старых данных...")
     Screening.objects.all().delete()
     Seat.objects.all().delete()
@@ -150,26 +189,24 @@ def create_demo_data():
         },
     ]
 
-    movie_objects = []
-    for idx, data in enumerate(movies_data):
-        movie = Movie.objects.create(
-            title=data['title'],
-            description=data['description'],
-            duration=data['duration']
-        )
-        
-        time.sleep(0.5)
-        poster_path = download_poster(data['title'], movie.id)
-        
-        if poster_path:
-            try:
-                with open(poster_path, 'rb') as img_file:
-                    movie.poster.save(os.path.basename(poster_path), File(img_file), save=True)
-            except Exception as e:
-                print(f"    ⚠ Ошибка сохранения постера: {e}")
-        
-        movie_objects.append(movie)
+    movie_objects = Movie.objects.bulk_create([
+        Movie(title=data['title'], description=data['description'], duration=data['duration'])
+        for data in movies_data
+    ])
+    for data in movies_data:
         print(f"  Создан фильм: {data['title']} ({data['genre']})")
+    # bulk_create обходит сигналы - поисковый индекс перестраиваем сами
+    rebuild_index()
+
+    # Постеры качаются в фоне, пока создаются залы и сеансы
+    poster_pool = None
+    poster_jobs = []
+    if poster_source is not None:
+        poster_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='demo-posters')
+        poster_jobs = [
+            (movie, poster_pool.submit(download_poster, movie.title, poster_source))
+            for movie in movie_objects
+        ]
 
     print("\n2. Создание кинозалов и мест...")
     halls_data = [
@@ -186,17 +223,17 @@ def create_demo_data():
         hall = CinemaHall.objects.create(**hall_data)
         hall_objects.append(hall)
         
-        seats_created = 0
-        for row in range(1, hall.rows + 1):
-            for seat_num in range(1, hall.seats_per_row + 1):
-                Seat.objects.create(hall=hall, row=row, number=seat_num)
-                seats_created += 1
+        seats_created = len(Seat.objects.bulk_create([
+            Seat(hall=hall, row=row, number=seat_num)
+            for row in range(1, hall.rows + 1)
+            for seat_num in range(1, hall.seats_per_row + 1)
+        ]))
         
         print(f"  Создан зал: {hall.name}, мест: {seats_created}")
 
     print("\n3. Создание сеансов на ближайшие 10 дней...")
     now = timezone.now()
-    screenings_created = 0
+    proposed = []
     
     daily_slots = [
         {'hour': 9, 'minute': 30, 'price': 250, 'type': 'Утренний'},
@@ -224,8 +261,6 @@ def create_demo_data():
                     microsecond=0
                 )
                 
-                end_time = start_time + timedelta(minutes=movie.duration + 25)
-                
                 price_multiplier = 1.0
                 if 'VIP' in hall.name:
                     price_multiplier = 1.5
@@ -236,14 +271,23 @@ def create_demo_data():
                 
                 final_price = int(slot['price'] * price_multiplier)
                 
-                Screening.objects.create(
-                    movie=movie,
-                    hall=hall,
-                    start_time=start_time,
-                    end_time=end_time,
-                    price=final_price
-                )
-                screenings_created += 1
+                proposed.append(propose(movie, hall, start_time, final_price))
+    
+    # Длинный фильм может не успеть закончиться до следующего слота -
+    # такие сеансы не создаются, чтобы не было пересечений в зале
+    schedule = import_schedule(proposed)
+    screenings_created = len(schedule.created)
+    if schedule.conflicts:
+        print(f"   Пропущено сеансов из-за пересечений: {len(schedule.conflicts)}")
+    
+    if poster_pool is not None:
+        print("\n   Ожидание загрузки постеров...")
+        for movie, job in poster_jobs:
+            name = job.result()
+            if name:
+                movie.poster = name
+                movie.save()
+        poster_pool.shutdown()
     
     print(f"\n{'='*50}")
     print("✅ ДЕМО-ДАННЫЕ УСПЕШНО СОЗДАНЫ!")
@@ -253,7 +297,7 @@ def create_demo_data():
     print(f"   💺 Общее количество мест: {sum(h.total_seats() for h in hall_objects)}")
     print(f"   🎟️  Сеансов создано: {screenings_created}")
     print(f"   📅 Расписание: на {10} дней вперед")
-    print(f"   📁 Изображения сохранены в: media/posters/")
+    print(f"   📁 Изображения сохранены в: media/{POSTERS_DIR}/")
     print(f"{'='*50}")
     
     print("\n4. Создание тестовых бронирований...")
@@ -284,4 +328,17 @@ def create_demo_data():
     print(f"   Пароль: testpass123")
 
 if __name__ == '__main__':
-    create_demo_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Заполняет базу демонстрационными данными')
+    parser.add_argument('--posters-dir', help='Брать постеры из локального каталога вместо сети')
+    parser.add_argument('--no-posters', action='store_true', help='Не загружать постеры')
+    parser.add_argument('--workers', type=int, default=8, help='Число параллельных загрузок постеров')
+    args = parser.parse_args()
+    
+    if args.no_posters:
+        source = None
+    elif args.posters_dir:
+        source = LocalPosterSource(args.posters_dir)
+    else:
+        source = HttpPosterSource(args.workers)
+    
+    create_demo_data(poster_source=source, workers=args.workers)
\ No newline at end of file
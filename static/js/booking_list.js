@@ -0,0 +1,12 @@
+document.addEventListener('click', (event) => {
+    const button = event.target.closest('.archive-more');
+    if (!button) return;
+    button.disabled = true;
+    fetch(button.dataset.url, {credentials: 'same-origin'})
+        .then((response) => response.text())
+        .then((html) => {
+            button.remove();
+            document.getElementById('archived_bookings').insertAdjacentHTML('beforeend', html);
+        })
+        .catch(() => { button.disabled = false; });
+});
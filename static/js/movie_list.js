@@ -0,0 +1,30 @@
+const searchConfig = document.currentScript.dataset;
+const searchInput = document.getElementById('movie_search');
+const suggestions = document.getElementById('movie_suggestions');
+let suggestTimer = null;
+
+searchInput.addEventListener('input', () => {
+    clearTimeout(suggestTimer);
+    const prefix = searchInput.value.trim();
+    if (prefix.length < 2) {
+        suggestions.replaceChildren();
+        return;
+    }
+    // Небольшая задержка, чтобы не отправлять запрос на каждое нажатие
+    suggestTimer = setTimeout(() => {
+        fetch(`${searchConfig.autocompleteUrl}?q=${encodeURIComponent(prefix)}`)
+            .then((response) => response.json())
+            .then((data) => {
+                suggestions.replaceChildren(...data.results.map((movie) => {
+                    const link = document.createElement('a');
+                    link.href = movie.url;
+                    link.className = 'list-group-item list-group-item-action';
+                    link.textContent = movie.title;
+                    return link;
+                }));
+            });
+    }, 150);
+});
+document.addEventListener('click', (event) => {
+    if (!suggestions.contains(event.target)) suggestions.replaceChildren();
+});
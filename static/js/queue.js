@@ -0,0 +1,18 @@
+const queueConfig = document.currentScript.dataset;
+const pollDelay = Number(queueConfig.pollSeconds) * 1000;
+
+function pollQueue() {
+    fetch(queueConfig.statusUrl, {credentials: 'same-origin'})
+        .then((response) => response.json())
+        .then((data) => {
+            if (!data.queued) {
+                window.location.href = data.url || queueConfig.seatsUrl;
+                return;
+            }
+            document.getElementById('queue_position').textContent = data.position;
+            document.getElementById('queue_wait').textContent = data.wait_seconds;
+            setTimeout(pollQueue, pollDelay);
+        })
+        .catch(() => setTimeout(pollQueue, pollDelay));
+}
+setTimeout(pollQueue, pollDelay);
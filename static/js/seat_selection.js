@@ -0,0 +1,85 @@
+const seatConfig = document.currentScript.dataset;
+const maxSeats = Number(seatConfig.maxSeats) - Number(seatConfig.held);
+const selectedSeats = new Map();
+
+function selectSeat(seatElement) {
+    const key = seatElement.dataset.seat;
+    
+    if (!selectedSeats.has(key) && !seatElement.classList.contains('available')) return;
+    
+    if (selectedSeats.has(key)) {
+        // Повторный клик снимает выделение
+        selectedSeats.get(key).remove();
+        selectedSeats.delete(key);
+        seatElement.classList.remove('selected');
+    } else {
+        if (selectedSeats.size >= maxSeats) return;
+        
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = 'seat';
+        input.value = key;
+        document.getElementById('selected_seats').appendChild(input);
+        selectedSeats.set(key, input);
+        seatElement.classList.add('selected');
+    }
+    
+    document.getElementById('book_btn').disabled = selectedSeats.size === 0;
+}
+
+function showBestSeats() {
+    const count = document.getElementById('best_count').value;
+    const message = document.getElementById('best_message');
+    fetch(`${seatConfig.bestSeatsUrl}?count=${count}`)
+        .then((response) => response.json())
+        .then((data) => {
+            [...selectedSeats.keys()].forEach((key) => selectSeat(document.querySelector(`.seat[data-seat="${key}"]`)));
+            if (!data.seats) {
+                message.textContent = `Не хватает свободных мест подряд в одном ряду: нужно ${count}.`;
+                return;
+            }
+            data.seats.forEach(([row, number]) => selectSeat(document.querySelector(`.seat[data-seat="${row}-${number}"]`)));
+            message.textContent = `Предложены места: ряд ${data.seats[0][0]}, ${data.seats.map(([, number]) => number).join(', ')}.`;
+        });
+}
+
+document.getElementById('best_show').addEventListener('click', showBestSeats);
+
+document.querySelector('.seating-chart').addEventListener('click', (event) => {
+    const seatElement = event.target.closest('.seat[data-seat]');
+    if (seatElement) selectSeat(seatElement);
+});
+
+function applySeatState(key, state) {
+    const seatElement = document.querySelector(`.seat[data-seat="${key}"]`);
+    // Места, удерживаемые текущим пользователем, сервер видит как held
+    if (!seatElement || (seatElement.classList.contains('selected') && !selectedSeats.has(key) && state === 'held')) return;
+    
+    if (selectedSeats.has(key) && state !== 'available') {
+        selectSeat(seatElement);
+    }
+    if (!selectedSeats.has(key)) {
+        seatElement.className = `seat ${state}`;
+    }
+}
+
+// Живое обновление занятости мест
+if (window.EventSource) {
+    const source = new EventSource(seatConfig.streamUrl);
+    source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        const bits = atob(data.booked);
+        const held = new Set(data.held.map(([row, number]) => `${row}-${number}`));
+        document.querySelectorAll('.seat[data-seat]').forEach((seatElement) => {
+            const key = seatElement.dataset.seat;
+            const [row, number] = key.split('-').map(Number);
+            const index = (row - 1) * data.seats_per_row + (number - 1);
+            const booked = bits.charCodeAt(index >> 3) & (1 << (index & 7));
+            applySeatState(key, booked ? 'booked' : held.has(key) ? 'held' : 'available');
+        });
+    });
+    source.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        Object.entries(delta.changes).forEach(([key, state]) => applySeatState(key, state));
+    });
+}